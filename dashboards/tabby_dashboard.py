@@ -1,9 +1,23 @@
+import time
+
+# Taken before any other import so startup cost counts towards first paint
+SCRIPT_STARTED = time.perf_counter()
+
+import logging
+from datetime import date
+
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import duckdb
 
+# plotly and pandas are only imported once a chart or table is drawn, see chart()
+
+logger = logging.getLogger('tabby-dashboard')
+
+# Time to the first KPI on screen should stay under this, warehouse size notwithstanding
+FIRST_PAINT_TARGET_SECONDS = 1.0
+
+SECTIONS = ["Overview", "Customer Analytics", "Payment Plans Analytics"]
+
 # Set page configuration
 st.set_page_config(page_title="Tabby Analytics Dashboard", page_icon="📊", layout="wide")
 
@@ -14,212 +28,230 @@ def get_connection():
 
 conn = get_connection()
 
-# Helper function to run queries
+# Helper function to run queries, results are cached per query text
+@st.cache_data(ttl=600, show_spinner=False)
 def run_query(query):
-    try:
-        return conn.execute(query).fetchdf()
-    except Exception as e:
-        st.error(f"Query error: {e}")
-        return pd.DataFrame()
+    with conn.cursor() as cursor:
+        return cursor.execute(query).fetchdf()
+
+def chart():
+    """plotly.express, imported on first use"""
+    import plotly.express as px
+    return px
+
+def loading(slot):
+    slot.caption("Loading…")
+    return slot
+
+def report_first_paint():
+    """Record time to the first meaningful element of the opened section"""
+    elapsed = time.perf_counter() - SCRIPT_STARTED
+    if elapsed > FIRST_PAINT_TARGET_SECONDS:
+        logger.warning(f"First paint took {elapsed:.2f}s, target is {FIRST_PAINT_TARGET_SECONDS:.2f}s")
+    st.sidebar.caption(f"First paint: {elapsed * 1000:.0f} ms (target {FIRST_PAINT_TARGET_SECONDS * 1000:.0f} ms)")
 
 # Title
 st.title("Tabby BNPL Analytics Dashboard")
 st.write("A comprehensive view of Buy Now Pay Later performance metrics")
+st.caption("Amounts are in USD, converted from AED/SAR/EGP/KWD at the rate on each transaction's date")
+
+# Only the selected section runs its queries
+section = st.sidebar.radio("Section", SECTIONS)
 
 # Sidebar for filtering
 st.sidebar.header("Filters")
 
 # Date range filter
 try:
-    # Get min and max dates from transactions
-    date_query = "SELECT MIN(transaction_date_key) as min_date, MAX(transaction_date_key) as max_date FROM bronze_silver.fact_transactions"
-    date_range = conn.execute(date_query).fetchone()
-    min_date, max_date = pd.to_datetime(date_range[0]), pd.to_datetime(date_range[1])
-    
+    # Get min and max dates from the daily aggregates rather than the fact table
+    date_query = "SELECT MIN(transaction_date_key) as min_date, MAX(transaction_date_key) as max_date FROM bronze_gold.gold_transaction_analytics"
+    date_range = run_query(date_query)
+    min_date, max_date = date_range['min_date'].iloc[0], date_range['max_date'].iloc[0]
+
     start_date = st.sidebar.date_input("Start Date", min_date)
     end_date = st.sidebar.date_input("End Date", max_date)
 except Exception as e:
     st.sidebar.error(f"Error loading date range: {e}")
-    start_date, end_date = pd.to_datetime('2024-01-01'), pd.to_datetime('2025-01-01')
+    start_date, end_date = date(2024, 1, 1), date(2025, 1, 1)
 
 # Apply filters to query
 date_filter = ""
 if start_date and end_date:
     date_filter = f"WHERE transaction_date_key BETWEEN '{start_date}' AND '{end_date}'"
 
-# Create a three-column layout
-col1, col2, col3 = st.columns(3)
+plans_date_filter = ""
+if start_date and end_date:
+    plans_date_filter = f"WHERE plan_date_key BETWEEN '{start_date}' AND '{end_date}'"
 
-# KPI Cards
-with col1:
-    try:
-        total_transactions = conn.execute(f"SELECT COUNT(*) FROM bronze_silver.fact_transactions {date_filter}").fetchone()[0]
-        st.metric("Total Transactions", f"{total_transactions:,}")
-    except Exception as e:
-        st.error(f"Error loading transaction count: {e}")
 
-with col2:
-    try:
-        total_amount = conn.execute(f"SELECT SUM(amount) FROM bronze_silver.fact_transactions {date_filter}").fetchone()[0]
-        st.metric("Total Transaction Value", f"${total_amount:,.2f}")
-    except Exception as e:
-        st.error(f"Error loading transaction value: {e}")
+def render_overview():
+    # Lay out every panel first, each is filled in as soon as its query returns
+    col1, col2, col3 = st.columns(3)
+    transactions_slot = loading(col1.empty())
+    value_slot = loading(col2.empty())
+    customers_slot = loading(col3.empty())
 
-with col3:
-    try:
-        active_customers = conn.execute(f"""
-            SELECT COUNT(DISTINCT customer_sk) 
-            FROM bronze_silver.fact_transactions 
-            {date_filter}
-        """).fetchone()[0]
-        st.metric("Active Customers", f"{active_customers:,}")
-    except Exception as e:
-        st.error(f"Error loading customer count: {e}")
-
-# Create a two-column layout for charts
-col1, col2 = st.columns(2)
+    col1, col2 = st.columns(2)
+    col1.subheader("Daily Transactions")
+    daily_slot = loading(col1.empty())
+    col2.subheader("Payment Method Distribution")
+    methods_slot = loading(col2.empty())
 
-# Transactions over time
-with col1:
-    st.subheader("Daily Transactions")
+    # KPI cards and the daily chart come from the daily aggregates, which stay
+    # small however many transactions the fact table holds
     try:
-        # Get transaction data by date
         query = f"""
-        SELECT 
-            CAST(transaction_date_key AS DATE) as date, 
-            COUNT(*) as transaction_count,
-            SUM(amount) as transaction_value
-        FROM bronze_silver.fact_transactions
+        SELECT
+            CAST(transaction_date_key AS DATE) as date,
+            transaction_count,
+            total_amount_usd as transaction_value
+        FROM bronze_gold.gold_transaction_analytics
         {date_filter}
-        GROUP BY date
         ORDER BY date
         """
-        transactions_by_date = conn.execute(query).fetchdf()
-        
-        # Plot
-        fig = px.line(transactions_by_date, x='date', y=['transaction_count', 'transaction_value'], 
+        transactions_by_date = run_query(query)
+
+        transactions_slot.metric("Total Transactions", f"{int(transactions_by_date['transaction_count'].sum()):,}")
+        value_slot.metric("Total Transaction Value (USD)", f"${transactions_by_date['transaction_value'].sum():,.2f}")
+        report_first_paint()
+
+        fig = chart().line(transactions_by_date, x='date', y=['transaction_count', 'transaction_value'],
                       title='Transactions Over Time',
-                      labels={'date': 'Date', 'value': 'Count/Value', 'variable': 'Metric'},
+                      labels={'date': 'Date', 'value': 'Count/Value (USD)', 'variable': 'Metric'},
                       color_discrete_sequence=['blue', 'green'])
-        st.plotly_chart(fig, use_container_width=True)
+        daily_slot.plotly_chart(fig, use_container_width=True)
     except Exception as e:
-        st.error(f"Error loading transactions chart: {e}")
+        transactions_slot.error(f"Error loading transaction metrics: {e}")
+        value_slot.empty()
+        daily_slot.empty()
+
+    # Distinct customers cannot be summed from daily totals, so they are
+    # counted over the customer-day aggregate instead of every transaction
+    try:
+        active_customers = run_query(f"""
+            SELECT COUNT(DISTINCT customer_sk) AS active_customers
+            FROM bronze_gold.gold_customer_daily_activity
+            {date_filter}
+        """)['active_customers'].iloc[0]
+        customers_slot.metric("Active Customers", f"{active_customers:,}")
+    except Exception as e:
+        customers_slot.error(f"Error loading customer count: {e}")
 
-# Payment Method Distribution
-with col2:
-    st.subheader("Payment Method Distribution")
     try:
         # Get payment method distribution
         query = f"""
-        SELECT 
-            payment_method, 
+        SELECT
+            CAST(payment_method AS VARCHAR) AS payment_method,
             COUNT(*) as count,
-            SUM(amount) as total_amount
+            SUM(amount_usd) as total_amount_usd
         FROM bronze_silver.fact_transactions
         {date_filter}
         GROUP BY payment_method
         ORDER BY count DESC
         """
-        payment_methods = conn.execute(query).fetchdf()
-        
+        payment_methods = run_query(query)
+
         # Plot
-        fig = px.pie(payment_methods, values='count', names='payment_method', 
+        fig = chart().pie(payment_methods, values='count', names='payment_method',
                     title='Transaction Count by Payment Method')
-        st.plotly_chart(fig, use_container_width=True)
+        methods_slot.plotly_chart(fig, use_container_width=True)
     except Exception as e:
-        st.error(f"Error loading payment methods chart: {e}")
+        methods_slot.error(f"Error loading payment methods chart: {e}")
 
-# Create a full-width row for customer analytics
-st.subheader("Customer Analytics")
-try:
-    # Get top customers by transaction value
-    query = f"""
-    SELECT 
-        c.customer_id,
-        c.first_name || ' ' || c.last_name as customer_name,
-        COUNT(t.transaction_id) as transaction_count,
-        SUM(t.amount) as total_spend
-    FROM bronze_silver.fact_transactions t
-    JOIN bronze_silver.dim_customers c ON t.customer_sk = c.customer_sk
-    {date_filter}
-    GROUP BY c.customer_id, customer_name
-    ORDER BY total_spend DESC
-    LIMIT 10
-    """
-    top_customers = conn.execute(query).fetchdf()
-    
-    # Plot
-    fig = px.bar(top_customers, y='customer_name', x='total_spend', 
-                orientation='h', title='Top 10 Customers by Spend',
-                labels={'customer_name': 'Customer', 'total_spend': 'Total Spend ($)'},
-                color='total_spend', color_continuous_scale='Viridis')
-    st.plotly_chart(fig, use_container_width=True)
-except Exception as e:
-    st.error(f"Error loading top customers chart: {e}")
 
-# Payment Plans Analytics section
-st.header("Payment Plans Analytics")
+def render_customer_analytics():
+    st.subheader("Customer Analytics")
+    top_customers_slot = loading(st.empty())
+    try:
+        # Get top customers by transaction value from the customer-day
+        # aggregate, names are only looked up for the ten customers shown
+        query = f"""
+        WITH top_customers AS (
+            SELECT
+                customer_sk,
+                SUM(transaction_count) as transaction_count,
+                SUM(total_amount_usd) as total_spend
+            FROM bronze_gold.gold_customer_daily_activity
+            {date_filter}
+            GROUP BY customer_sk
+            ORDER BY total_spend DESC
+            LIMIT 10
+        )
+        SELECT
+            c.customer_id,
+            c.first_name || ' ' || c.last_name as customer_name,
+            t.transaction_count,
+            t.total_spend
+        FROM top_customers t
+        JOIN bronze_silver.dim_customers c ON t.customer_sk = c.customer_sk
+        ORDER BY total_spend DESC
+        """
+        top_customers = run_query(query)
+        report_first_paint()
+
+        # Plot
+        fig = chart().bar(top_customers, y='customer_name', x='total_spend',
+                    orientation='h', title='Top 10 Customers by Spend',
+                    labels={'customer_name': 'Customer', 'total_spend': 'Total Spend (USD)'},
+                    color='total_spend', color_continuous_scale='Viridis')
+        top_customers_slot.plotly_chart(fig, use_container_width=True)
+    except Exception as e:
+        top_customers_slot.error(f"Error loading top customers chart: {e}")
+
+
+def render_payment_plans():
+    st.header("Payment Plans Analytics")
 
-try:
-    # Update date filter for payment plans
-    plans_date_filter = ""
-    if start_date and end_date:
-        plans_date_filter = f"WHERE plan_date_key BETWEEN '{start_date}' AND '{end_date}'"
-    
-    # Query for payment plan metrics
-    plan_metrics_query = f"""
-    SELECT
-        COUNT(*) AS total_plans,
-        SUM(CASE WHEN status = 'active' OR status = 'in_progress' THEN 1 ELSE 0 END) AS active_plans,
-        SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) AS completed_plans,
-        SUM(CASE WHEN status = 'defaulted' THEN 1 ELSE 0 END) AS defaulted_plans
-    FROM bronze_silver.fact_payment_plans
-    {plans_date_filter}
-    """
-    plan_metrics = run_query(plan_metrics_query)
-    
-    # Display payment plan metrics
     col1, col2, col3, col4 = st.columns(4)
-    with col1:
-        st.metric("Total Payment Plans", f"{plan_metrics['total_plans'].iloc[0]:,}")
-    with col2:
-        st.metric("Active Plans", f"{plan_metrics['active_plans'].iloc[0]:,}")
-    with col3:
-        st.metric("Completed Plans", f"{plan_metrics['completed_plans'].iloc[0]:,}")
-    with col4:
-        st.metric("Defaulted Plans", f"{plan_metrics['defaulted_plans'].iloc[0]:,}")
-    
-    # Payment plan completion rate trend
-    completion_query = f"""
-    SELECT
-        DATE_TRUNC('month', plan_date_key) AS month,
-        AVG(payment_completion_rate) AS avg_completion_rate
-    FROM bronze_silver.fact_payment_plans
-    {plans_date_filter}
-    GROUP BY month
-    ORDER BY month
-    """
-    completion_df = run_query(completion_query)
-    
-    # Payment plans by installment count
-    installment_query = f"""
-    SELECT
-        installment_count,
-        COUNT(*) AS plan_count
-    FROM bronze_silver.fact_payment_plans
-    {plans_date_filter}
-    GROUP BY installment_count
-    ORDER BY installment_count
-    """
-    installment_df = run_query(installment_query)
-    
-    # Create charts
+    metric_slots = [loading(col.empty()) for col in (col1, col2, col3, col4)]
+
     col1, col2 = st.columns(2)
-    
-    with col1:
-        st.subheader("Payment Plan Completion Rate Trend")
+    col1.subheader("Payment Plan Completion Rate Trend")
+    completion_slot = loading(col1.empty())
+    col2.subheader("Plans by Installment Count")
+    installment_slot = loading(col2.empty())
+
+    st.subheader("Merchants with Highest Default Rates")
+    default_slot = loading(st.empty())
+
+    try:
+        # Query for payment plan metrics
+        plan_metrics_query = f"""
+        SELECT
+            COUNT(*) AS total_plans,
+            SUM(CASE WHEN status = 'active' OR status = 'in_progress' THEN 1 ELSE 0 END) AS active_plans,
+            SUM(CASE WHEN status = 'completed' THEN 1 ELSE 0 END) AS completed_plans,
+            SUM(CASE WHEN status = 'defaulted' THEN 1 ELSE 0 END) AS defaulted_plans
+        FROM bronze_silver.fact_payment_plans
+        {plans_date_filter}
+        """
+        plan_metrics = run_query(plan_metrics_query)
+
+        # Display payment plan metrics
+        labels = [
+            ("Total Payment Plans", 'total_plans'),
+            ("Active Plans", 'active_plans'),
+            ("Completed Plans", 'completed_plans'),
+            ("Defaulted Plans", 'defaulted_plans'),
+        ]
+        for slot, (label, column) in zip(metric_slots, labels):
+            slot.metric(label, f"{plan_metrics[column].iloc[0]:,}")
+        report_first_paint()
+
+        # Payment plan completion rate trend
+        completion_query = f"""
+        SELECT
+            DATE_TRUNC('month', plan_date_key) AS month,
+            AVG(payment_completion_rate) AS avg_completion_rate
+        FROM bronze_silver.fact_payment_plans
+        {plans_date_filter}
+        GROUP BY month
+        ORDER BY month
+        """
+        completion_df = run_query(completion_query)
+
         if not completion_df.empty:
-            fig_completion = px.line(
+            fig_completion = chart().line(
                 completion_df,
                 x='month',
                 y='avg_completion_rate',
@@ -227,68 +259,85 @@ try:
                 markers=True
             )
             fig_completion.update_layout(yaxis_tickformat='.1%')
-            st.plotly_chart(fig_completion, use_container_width=True)
+            completion_slot.plotly_chart(fig_completion, use_container_width=True)
         else:
-            st.info("No payment plan completion data available for the selected date range.")
-    
-    with col2:
-        st.subheader("Plans by Installment Count")
+            completion_slot.info("No payment plan completion data available for the selected date range.")
+
+        # Payment plans by installment count
+        installment_query = f"""
+        SELECT
+            installment_count,
+            COUNT(*) AS plan_count
+        FROM bronze_silver.fact_payment_plans
+        {plans_date_filter}
+        GROUP BY installment_count
+        ORDER BY installment_count
+        """
+        installment_df = run_query(installment_query)
+
         if not installment_df.empty:
-            fig_installment = px.bar(
+            fig_installment = chart().bar(
                 installment_df,
                 x='installment_count',
                 y='plan_count',
                 labels={'installment_count': 'Number of Installments', 'plan_count': 'Number of Plans'},
                 text='plan_count'
             )
-            st.plotly_chart(fig_installment, use_container_width=True)
+            installment_slot.plotly_chart(fig_installment, use_container_width=True)
         else:
-            st.info("No installment data available for the selected date range.")
-    
-    # Merchants with high default rates
-    default_query = f"""
-    WITH merchant_defaults AS (
+            installment_slot.info("No installment data available for the selected date range.")
+
+        # Merchants with high default rates
+        default_query = f"""
+        WITH merchant_defaults AS (
+            SELECT
+                m.merchant_name,
+                COUNT(p.plan_id) AS total_plans,
+                SUM(CASE WHEN p.status = 'defaulted' THEN 1 ELSE 0 END) AS defaulted_plans,
+                SUM(p.total_amount_usd) AS total_amount_usd
+            FROM bronze_silver.fact_payment_plans p
+            JOIN bronze_silver.dim_merchants m ON p.merchant_sk = m.merchant_sk
+            {plans_date_filter}
+            GROUP BY m.merchant_name
+        )
         SELECT
-            m.merchant_name,
-            COUNT(p.plan_id) AS total_plans,
-            SUM(CASE WHEN p.status = 'defaulted' THEN 1 ELSE 0 END) AS defaulted_plans,
-            SUM(p.total_amount) AS total_amount
-        FROM bronze_silver.fact_payment_plans p
-        JOIN bronze_silver.dim_merchants m ON p.merchant_sk = m.merchant_sk
-        {plans_date_filter}
-        GROUP BY m.merchant_name
-    )
-    SELECT
-        merchant_name,
-        total_plans,
-        defaulted_plans,
-        CASE 
-            WHEN total_plans > 0 THEN defaulted_plans * 1.0 / total_plans
-            ELSE 0
-        END AS default_rate,
-        total_amount
-    FROM merchant_defaults
-    WHERE total_plans >= 5
-    ORDER BY default_rate DESC
-    LIMIT 10
-    """
-    default_df = run_query(default_query)
-    
-    st.subheader("Merchants with Highest Default Rates")
-    if not default_df.empty:
-        # Format the columns for better display
-        formatted_df = default_df.copy()
-        formatted_df['default_rate'] = formatted_df['default_rate'].apply(lambda x: f"{x:.1%}")
-        formatted_df['total_amount'] = formatted_df['total_amount'].apply(lambda x: f"${x:,.2f}")
-        
-        st.dataframe(formatted_df)
-    else:
-        st.info("No merchants with sufficient payment plans found in the selected date range.")
+            merchant_name,
+            total_plans,
+            defaulted_plans,
+            CASE
+                WHEN total_plans > 0 THEN defaulted_plans * 1.0 / total_plans
+                ELSE 0
+            END AS default_rate,
+            total_amount_usd
+        FROM merchant_defaults
+        WHERE total_plans >= 5
+        ORDER BY default_rate DESC
+        LIMIT 10
+        """
+        default_df = run_query(default_query)
 
-except Exception as e:
-    st.error(f"Error in Payment Plans Analytics: {str(e)}")
-    st.code(str(e))
+        if not default_df.empty:
+            # Format the columns for better display
+            formatted_df = default_df.copy()
+            formatted_df['default_rate'] = formatted_df['default_rate'].apply(lambda x: f"{x:.1%}")
+            formatted_df['total_amount_usd'] = formatted_df['total_amount_usd'].apply(lambda x: f"${x:,.2f}")
+
+            default_slot.dataframe(formatted_df)
+        else:
+            default_slot.info("No merchants with sufficient payment plans found in the selected date range.")
+
+    except Exception as e:
+        st.error(f"Error in Payment Plans Analytics: {str(e)}")
+        st.code(str(e))
+
+
+if section == "Overview":
+    render_overview()
+elif section == "Customer Analytics":
+    render_customer_analytics()
+else:
+    render_payment_plans()
 
 # Footer
 st.markdown("---")
-st.markdown("Tabby BNPL Data Warehouse Project | Created by Taiwo")
\ No newline at end of file
+st.markdown("Tabby BNPL Data Warehouse Project | Created by Taiwo")
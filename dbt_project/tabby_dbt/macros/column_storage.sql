@@ -0,0 +1,119 @@
+{#
+    Storage helpers for the silver fact tables.
+
+    enum_domains reads the distinct values of several low-cardinality columns
+    of the upstream relation in one aggregate, so each model scans it once
+    however many columns it converts. enum_cast then turns a column into a
+    DuckDB ENUM over that domain, so it is stored as a small dictionary code
+    instead of a VARCHAR:
+
+        {%- set domains = enum_domains(ref('stg_transactions'), ['currency', 'status']) -%}
+        {{ enum_cast('currency', domains) }} as currency
+
+    report_fact_compression checkpoints the database, then records the
+    per-column compression and segment counts of each fact table from
+    pragma_storage_info into column_compression_stats in the silver schema.
+    Row groups not yet checkpointed show as Uncompressed, so it runs once
+    after the builds rather than as a post-hook, which would also conflict
+    with models still running on other threads. scripts/run_pipeline.py
+    calls it after every run that rebuilt a fact; by hand:
+
+        dbt run-operation report_fact_compression
+#}
+
+{% macro enum_domains(relation, columns) -%}
+    {%- set domains = {} -%}
+    {%- if execute -%}
+        {%- set query -%}
+            select
+            {%- for column in columns %}
+                to_json(list(distinct {{ column }} order by {{ column }}) filter (where {{ column }} is not null))::varchar as {{ column }}{% if not loop.last %},{% endif %}
+            {%- endfor %}
+            from {{ relation }}
+        {%- endset -%}
+        {%- set row = run_query(query).rows[0] -%}
+        {%- for column in columns -%}
+            {%- do domains.update({column: fromjson(row[loop.index0]) if row[loop.index0] else []}) -%}
+        {%- endfor -%}
+    {%- endif -%}
+    {{ return(domains) }}
+{%- endmacro %}
+
+
+{% macro enum_cast(column_name, domains) -%}
+    {%- set values = domains.get(column_name, []) -%}
+    {%- if values -%}
+        cast({{ column_name }} as enum({% for value in values %}'{{ value | replace("'", "''") }}'{% if not loop.last %}, {% endif %}{% endfor %}))
+    {%- else -%}
+        {{ column_name }}
+    {%- endif -%}
+{%- endmacro %}
+
+
+{% macro create_compression_stats_table() %}
+    {%- set schema_name = generate_schema_name('silver') -%}
+    create schema if not exists {{ schema_name }};
+    create table if not exists {{ schema_name }}.column_compression_stats (
+        table_name varchar,
+        column_name varchar,
+        column_type varchar,
+        compression varchar,
+        row_group_count bigint,
+        segment_count bigint,
+        persistent_segment_count bigint,
+        row_count bigint,
+        measured_at timestamp
+    );
+{% endmacro %}
+
+
+{% macro record_compression(relation) %}
+    {%- if execute -%}
+        {%- set stats_table = relation.schema ~ '.column_compression_stats' -%}
+        {%- set storage_name = relation.schema ~ '.' ~ relation.identifier -%}
+
+        {% call statement('record_compression') %}
+            delete from {{ stats_table }} where table_name = '{{ relation.identifier }}';
+
+            insert into {{ stats_table }}
+            select
+                '{{ relation.identifier }}' as table_name,
+                column_name,
+                segment_type as column_type,
+                string_agg(distinct compression, ', ' order by compression) as compression,
+                count(distinct row_group_id) as row_group_count,
+                count(*) as segment_count,
+                count(*) filter (where persistent) as persistent_segment_count,
+                sum(count) as row_count,
+                current_timestamp as measured_at
+            from pragma_storage_info('{{ storage_name }}')
+            where segment_type != 'VALIDITY'
+            group by column_name, column_id, segment_type
+            order by column_id;
+        {% endcall %}
+
+        {%- set stats = run_query("select column_name, column_type, compression, row_group_count, segment_count from " ~ stats_table ~ " where table_name = '" ~ relation.identifier ~ "'") -%}
+        {%- set compressed = stats.rows | rejectattr('compression', 'equalto', 'Uncompressed') | list -%}
+        {%- for row in stats.rows -%}
+            {{ log(relation.identifier ~ "." ~ row[0] ~ " (" ~ row[1] ~ "): " ~ row[2] ~ ", " ~ row[3] ~ " row groups, " ~ row[4] ~ " segments") }}
+        {%- endfor -%}
+        {{ log(relation.identifier ~ ": " ~ compressed | length ~ " of " ~ stats.rows | length ~ " columns compressed, see " ~ stats_table, info=True) }}
+    {%- endif -%}
+{% endmacro %}
+
+
+{% macro report_fact_compression() %}
+    {% do run_query(create_compression_stats_table()) %}
+    {% do run_query("checkpoint") %}
+
+    {% for model_name in ['fact_transactions', 'fact_payment_plans', 'fact_customer_events'] %}
+        {% do record_compression(ref(model_name)) %}
+    {% endfor %}
+    {#- run-operation does not commit on its own -#}
+    {% do adapter.commit() %}
+
+    {%- set size = run_query("select database_size, used_blocks, block_size from pragma_database_size() where database_name = current_database()") -%}
+    {%- for row in size.rows -%}
+        {{ log("Database size: " ~ row[0] ~ " (" ~ row[1] ~ " blocks of " ~ row[2] ~ " bytes)", info=True) }}
+    {%- endfor -%}
+{% endmacro %}
@@ -0,0 +1,43 @@
+{#
+    Per-model DuckDB resource budgets.
+
+    A model (or a folder in dbt_project.yml) can set duckdb_memory_limit,
+    duckdb_threads and duckdb_preserve_insertion_order. apply_resource_limits
+    runs as a pre-hook and reset_resource_limits restores the profile
+    defaults afterwards; models without these configs are left alone.
+
+    They are database-wide DuckDB settings, so while a budgeted model runs
+    its budget also applies to models on other dbt threads. The spill
+    directory is only set when the database opens (config_options in
+    profiles.yml), because DuckDB cannot switch it once something has been
+    spilled.
+#}
+
+{% macro apply_resource_limits() %}
+    {%- set statements = [] -%}
+    {%- if config.get('duckdb_memory_limit') -%}
+        {%- do statements.append("set memory_limit = '" ~ config.get('duckdb_memory_limit') ~ "'") -%}
+    {%- endif -%}
+    {%- if config.get('duckdb_threads') -%}
+        {%- do statements.append("set threads = " ~ config.get('duckdb_threads')) -%}
+    {%- endif -%}
+    {%- if config.get('duckdb_preserve_insertion_order') is not none -%}
+        {%- do statements.append("set preserve_insertion_order = " ~ config.get('duckdb_preserve_insertion_order')) -%}
+    {%- endif -%}
+    {{ statements | join(';\n') }}
+{% endmacro %}
+
+
+{% macro reset_resource_limits() %}
+    {%- set statements = [] -%}
+    {%- if config.get('duckdb_memory_limit') -%}
+        {%- do statements.append("set memory_limit = '" ~ env_var('DUCKDB_MEMORY_LIMIT', '4GB') ~ "'") -%}
+    {%- endif -%}
+    {%- if config.get('duckdb_threads') -%}
+        {%- do statements.append("set threads = " ~ env_var('DUCKDB_THREADS', '4')) -%}
+    {%- endif -%}
+    {%- if config.get('duckdb_preserve_insertion_order') is not none -%}
+        {%- do statements.append("set preserve_insertion_order = true") -%}
+    {%- endif -%}
+    {{ statements | join(';\n') }}
+{% endmacro %}
@@ -21,27 +21,55 @@ fact_customer_events as (
     select * from {{ ref('fact_customer_events') }}
 ),
 
--- Calculate customer purchase metrics
-customer_purchase_metrics as (
+-- Distinct counts and currency lists are built from pre-grouped pairs:
+-- a plain GROUP BY spills to disk under the memory limit, while
+-- count(distinct ...) keeps a hash set per group in memory.
+-- The surrogate keys are unique per fact row, so counting them is count(*).
+completed_transactions as (
+    select * from fact_transactions
+    where status = 'completed'
+),
+
+customer_merchant_counts as (
+    select customer_sk, count(merchant_sk) as unique_merchants_count
+    from (select customer_sk, merchant_sk from completed_transactions group by 1, 2)
+    group by 1
+),
+
+customer_currencies as (
+    select customer_sk, list(currency order by currency) as currencies_used
+    from (select customer_sk, currency from completed_transactions group by 1, 2)
+    group by 1
+),
+
+customer_transaction_totals as (
     select
         customer_sk,
-        count(distinct transaction_sk) as total_transactions,
-        sum(amount) as total_spent,
-        avg(amount) as avg_transaction_amount,
+        count(*) as total_transactions,
+        sum(amount_usd) as total_spent_usd,
+        avg(amount_usd) as avg_transaction_amount_usd,
         min(transaction_date) as first_transaction_date,
-        max(transaction_date) as last_transaction_date,
-        count(distinct merchant_sk) as unique_merchants_count,
-        array_agg(distinct currency) as currencies_used
-    from fact_transactions
-    where status = 'completed'
+        max(transaction_date) as last_transaction_date
+    from completed_transactions
     group by 1
 ),
 
+-- Calculate customer purchase metrics
+customer_purchase_metrics as (
+    select
+        t.*,
+        mc.unique_merchants_count,
+        cc.currencies_used
+    from customer_transaction_totals t
+    left join customer_merchant_counts mc on t.customer_sk = mc.customer_sk
+    left join customer_currencies cc on t.customer_sk = cc.customer_sk
+),
+
 -- Calculate payment plan metrics
 customer_payment_plan_metrics as (
     select
         customer_sk,
-        count(distinct plan_sk) as total_payment_plans,
+        count(*) as total_payment_plans,
         sum(case when status = 'active' then 1 else 0 end) as active_payment_plans,
         sum(case when status = 'completed' then 1 else 0 end) as completed_payment_plans,
         sum(case when status = 'defaulted' then 1 else 0 end) as defaulted_payment_plans,
@@ -50,23 +78,43 @@ customer_payment_plan_metrics as (
     group by 1
 ),
 
--- Calculate engagement metrics
-customer_engagement_metrics as (
+customer_session_counts as (
+    select customer_sk, count(session_id) as total_sessions
+    from (select customer_sk, session_id from fact_customer_events group by 1, 2)
+    group by 1
+),
+
+customer_active_days as (
+    select customer_sk, count(event_date_key) as active_days
+    from (select customer_sk, event_date_key from fact_customer_events group by 1, 2)
+    group by 1
+),
+
+customer_event_totals as (
     select
         customer_sk,
-        count(distinct event_sk) as total_events,
-        count(distinct session_id) as total_sessions,
-        count(distinct event_date_key) as active_days,
-        count(distinct case when event_type = 'app_open' then event_sk end) as app_opens,
-        count(distinct case when event_type = 'product_view' then event_sk end) as product_views,
-        count(distinct case when event_type = 'search' then event_sk end) as searches,
-        count(distinct case when event_type = 'add_to_cart' then event_sk end) as add_to_carts,
-        count(distinct case when event_type = 'checkout' then event_sk end) as checkouts,
-        count(distinct case when event_type = 'purchase' then event_sk end) as purchases
+        count(*) as total_events,
+        count(*) filter (where event_type = 'app_open') as app_opens,
+        count(*) filter (where event_type = 'product_view') as product_views,
+        count(*) filter (where event_type = 'search') as searches,
+        count(*) filter (where event_type = 'add_to_cart') as add_to_carts,
+        count(*) filter (where event_type = 'checkout') as checkouts,
+        count(*) filter (where event_type = 'purchase') as purchases
     from fact_customer_events
     group by 1
 ),
 
+-- Calculate engagement metrics
+customer_engagement_metrics as (
+    select
+        e.*,
+        s.total_sessions,
+        d.active_days
+    from customer_event_totals e
+    left join customer_session_counts s on e.customer_sk = s.customer_sk
+    left join customer_active_days d on e.customer_sk = d.customer_sk
+),
+
 -- Final customer analytics model
 final as (
     select
@@ -84,8 +132,8 @@ final as (
         
         -- Transaction metrics
         coalesce(pm.total_transactions, 0) as total_transactions,
-        coalesce(pm.total_spent, 0) as total_spent,
-        pm.avg_transaction_amount,
+        coalesce(pm.total_spent_usd, 0) as total_spent_usd,
+        pm.avg_transaction_amount_usd,
         pm.first_transaction_date,
         pm.last_transaction_date,
         coalesce(pm.unique_merchants_count, 0) as unique_merchants_count,
@@ -115,9 +163,9 @@ final as (
         
         -- Customer segments
         case
-            when coalesce(pm.total_spent, 0) = 0 then 'No Purchases'
-            when coalesce(pm.total_spent, 0) >= 5000 then 'High Value'
-            when coalesce(pm.total_spent, 0) >= 1000 then 'Medium Value'
+            when coalesce(pm.total_spent_usd, 0) = 0 then 'No Purchases'
+            when coalesce(pm.total_spent_usd, 0) >= 5000 then 'High Value'
+            when coalesce(pm.total_spent_usd, 0) >= 1000 then 'Medium Value'
             else 'Low Value'
         end as value_segment,
         
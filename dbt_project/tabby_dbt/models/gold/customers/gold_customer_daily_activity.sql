@@ -0,0 +1,39 @@
+{{
+    config(
+        materialized='table',
+        tags=['customers', 'gold']
+    )
+}}
+
+with fact_transactions as (
+    select * from {{ ref('fact_transactions') }}
+),
+
+-- One row per customer and day they transacted. Active customers and
+-- spend per customer over any date range are read from here rather than
+-- from the fact table, see dashboards/tabby_dashboard.py
+customer_daily_activity as (
+    select
+        transaction_date_key,
+        customer_sk,
+        count(*) as transaction_count,
+        sum(amount_usd) as total_amount_usd
+    from fact_transactions
+    group by 1, 2
+),
+
+final as (
+    select
+        transaction_date_key,
+        customer_sk,
+        transaction_count,
+        total_amount_usd,
+
+        -- Add metadata
+        current_timestamp as dbt_updated_at
+    from customer_daily_activity
+)
+
+select * from final
+-- Sorted by date so date-range filters skip row groups
+order by transaction_date_key, customer_sk
@@ -28,13 +28,13 @@ daily_payment_plans as (
         count(distinct plan_sk) as plan_count,
         count(distinct customer_sk) as customer_count,
         count(distinct merchant_sk) as merchant_count,
-        sum(total_amount) as total_amount,
-        avg(total_amount) as avg_plan_amount,
+        sum(total_amount_usd) as total_amount_usd,
+        avg(total_amount_usd) as avg_plan_amount_usd,
         avg(installment_count) as avg_installment_count,
         count(distinct case when status = 'active' then plan_sk end) as active_plans,
         count(distinct case when status = 'completed' then plan_sk end) as completed_plans,
         count(distinct case when status = 'defaulted' then plan_sk end) as defaulted_plans,
-        sum(payment_completion_rate * total_amount) / sum(total_amount) as weighted_completion_rate
+        sum(payment_completion_rate * total_amount_usd) / sum(total_amount_usd) as weighted_completion_rate
     from fact_payment_plans
     group by 1
 ),
@@ -46,8 +46,8 @@ merchant_payment_plans as (
         plan_date_key,
         count(distinct plan_sk) as plan_count,
         count(distinct customer_sk) as customer_count,
-        sum(total_amount) as total_amount,
-        avg(total_amount) as avg_plan_amount,
+        sum(total_amount_usd) as total_amount_usd,
+        avg(total_amount_usd) as avg_plan_amount_usd,
         count(distinct case when status = 'defaulted' then plan_sk end) as defaulted_plans,
         count(distinct case when status = 'defaulted' then plan_sk end) / nullif(count(distinct plan_sk), 0) as default_rate
     from fact_payment_plans
@@ -70,8 +70,8 @@ final as (
         dp.plan_count,
         dp.customer_count,
         dp.merchant_count,
-        dp.total_amount,
-        dp.avg_plan_amount,
+        dp.total_amount_usd,
+        dp.avg_plan_amount_usd,
         dp.avg_installment_count,
         dp.active_plans,
         dp.completed_plans,
@@ -104,12 +104,12 @@ final as (
                 'merchant_sk', mp.merchant_sk,
                 'merchant_name', m.merchant_name,
                 'plan_count', mp.plan_count,
-                'total_amount', mp.total_amount
+                'total_amount_usd', mp.total_amount_usd
             )
             from merchant_payment_plans mp
             left join dim_merchants m on mp.merchant_sk = m.merchant_sk
             where mp.plan_date_key = dp.plan_date_key
-            order by mp.total_amount desc
+            order by mp.total_amount_usd desc
             limit 5
         ) as top_merchants_by_volume,
         
@@ -21,27 +21,55 @@ fact_customer_events as (
     select * from {{ ref('fact_customer_events') }}
 ),
 
--- Calculate merchant sales metrics
-merchant_sales_metrics as (
+-- Distinct counts and currency lists are built from pre-grouped pairs:
+-- a plain GROUP BY spills to disk under the memory limit, while
+-- count(distinct ...) keeps a hash set per group in memory.
+-- The surrogate keys are unique per fact row, so counting them is count(*).
+completed_transactions as (
+    select * from fact_transactions
+    where status = 'completed'
+),
+
+merchant_customer_counts as (
+    select merchant_sk, count(customer_sk) as unique_customers
+    from (select merchant_sk, customer_sk from completed_transactions group by 1, 2)
+    group by 1
+),
+
+merchant_currencies as (
+    select merchant_sk, list(currency order by currency) as currencies_used
+    from (select merchant_sk, currency from completed_transactions group by 1, 2)
+    group by 1
+),
+
+merchant_sales_totals as (
     select
         merchant_sk,
-        count(distinct transaction_sk) as total_transactions,
-        count(distinct customer_sk) as unique_customers,
-        sum(amount) as total_sales_amount,
-        avg(amount) as avg_transaction_amount,
+        count(*) as total_transactions,
+        sum(amount_usd) as total_sales_amount_usd,
+        avg(amount_usd) as avg_transaction_amount_usd,
         min(transaction_date) as first_transaction_date,
-        max(transaction_date) as last_transaction_date,
-        array_agg(distinct currency) as currencies_used
-    from fact_transactions
-    where status = 'completed'
+        max(transaction_date) as last_transaction_date
+    from completed_transactions
     group by 1
 ),
 
+-- Calculate merchant sales metrics
+merchant_sales_metrics as (
+    select
+        t.*,
+        cc.unique_customers,
+        mc.currencies_used
+    from merchant_sales_totals t
+    left join merchant_customer_counts cc on t.merchant_sk = cc.merchant_sk
+    left join merchant_currencies mc on t.merchant_sk = mc.merchant_sk
+),
+
 -- Calculate payment plan metrics
 merchant_payment_plan_metrics as (
     select
         merchant_sk,
-        count(distinct plan_sk) as total_payment_plans,
+        count(*) as total_payment_plans,
         sum(case when status = 'active' then 1 else 0 end) as active_payment_plans,
         sum(case when status = 'completed' then 1 else 0 end) as completed_payment_plans,
         sum(case when status = 'defaulted' then 1 else 0 end) as defaulted_payment_plans,
@@ -51,33 +79,67 @@ merchant_payment_plan_metrics as (
     group by 1
 ),
 
+merchant_events as (
+    select * from fact_customer_events
+    where merchant_sk is not null
+),
+
+merchant_engaged_customers as (
+    select merchant_sk, count(customer_sk) as engaged_customers
+    from (select merchant_sk, customer_sk from merchant_events group by 1, 2)
+    group by 1
+),
+
+merchant_event_totals as (
+    select
+        merchant_sk,
+        count(*) as total_events,
+        count(*) filter (where event_type = 'product_view') as product_views,
+        count(*) filter (where event_type = 'add_to_cart') as add_to_carts,
+        count(*) filter (where event_type = 'checkout') as checkouts,
+        count(*) filter (where event_type = 'purchase') as purchases
+    from merchant_events
+    group by 1
+),
+
 -- Calculate customer engagement metrics
 merchant_engagement_metrics as (
+    select
+        e.*,
+        c.engaged_customers
+    from merchant_event_totals e
+    left join merchant_engaged_customers c on e.merchant_sk = c.merchant_sk
+),
+
+recent_transactions as (
+    select * from completed_transactions
+    where transaction_date >= current_date() - interval '30 days'
+),
+
+merchant_recent_customers as (
+    select merchant_sk, count(customer_sk) as customers_last_30d
+    from (select merchant_sk, customer_sk from recent_transactions group by 1, 2)
+    group by 1
+),
+
+merchant_recent_totals as (
     select
         merchant_sk,
-        count(distinct event_sk) as total_events,
-        count(distinct customer_sk) as engaged_customers,
-        count(distinct case when event_type = 'product_view' then event_sk end) as product_views,
-        count(distinct case when event_type = 'add_to_cart' then event_sk end) as add_to_carts,
-        count(distinct case when event_type = 'checkout' then event_sk end) as checkouts,
-        count(distinct case when event_type = 'purchase' then event_sk end) as purchases
-    from fact_customer_events
-    where merchant_sk is not null
+        count(*) as transactions_last_30d,
+        sum(amount_usd) as sales_amount_last_30d_usd
+    from recent_transactions
     group by 1
 ),
 
 -- Calculate recent metrics (last 30 days)
 merchant_recent_metrics as (
     select
-        merchant_sk,
-        count(distinct transaction_sk) as transactions_last_30d,
-        count(distinct customer_sk) as customers_last_30d,
-        sum(amount) as sales_amount_last_30d
-    from fact_transactions
-    where 
-        status = 'completed'
-        and transaction_date >= current_date() - interval '30 days'
-    group by 1
+        t.merchant_sk,
+        t.transactions_last_30d,
+        c.customers_last_30d,
+        t.sales_amount_last_30d_usd
+    from merchant_recent_totals t
+    left join merchant_recent_customers c on t.merchant_sk = c.merchant_sk
 ),
 
 -- Final merchant analytics model
@@ -97,8 +159,8 @@ final as (
         -- Sales metrics
         coalesce(sm.total_transactions, 0) as total_transactions,
         coalesce(sm.unique_customers, 0) as unique_customers,
-        coalesce(sm.total_sales_amount, 0) as total_sales_amount,
-        sm.avg_transaction_amount,
+        coalesce(sm.total_sales_amount_usd, 0) as total_sales_amount_usd,
+        sm.avg_transaction_amount_usd,
         sm.first_transaction_date,
         sm.last_transaction_date,
         sm.currencies_used,
@@ -139,20 +201,20 @@ final as (
         -- Recent metrics
         coalesce(rm.transactions_last_30d, 0) as transactions_last_30d,
         coalesce(rm.customers_last_30d, 0) as customers_last_30d,
-        coalesce(rm.sales_amount_last_30d, 0) as sales_amount_last_30d,
+        coalesce(rm.sales_amount_last_30d_usd, 0) as sales_amount_last_30d_usd,
         
         -- Customer value
         case
             when coalesce(sm.unique_customers, 0) > 0 
-                then coalesce(sm.total_sales_amount, 0) / coalesce(sm.unique_customers, 0)
+                then coalesce(sm.total_sales_amount_usd, 0) / coalesce(sm.unique_customers, 0)
             else 0
-        end as avg_customer_value,
+        end as avg_customer_value_usd,
         
         -- Merchant segments
         case
-            when coalesce(sm.total_sales_amount, 0) = 0 then 'No Sales'
-            when coalesce(sm.total_sales_amount, 0) >= 50000 then 'High Volume'
-            when coalesce(sm.total_sales_amount, 0) >= 10000 then 'Medium Volume'
+            when coalesce(sm.total_sales_amount_usd, 0) = 0 then 'No Sales'
+            when coalesce(sm.total_sales_amount_usd, 0) >= 50000 then 'High Volume'
+            when coalesce(sm.total_sales_amount_usd, 0) >= 10000 then 'Medium Volume'
             else 'Low Volume'
         end as volume_segment,
         
@@ -28,10 +28,10 @@ daily_transactions as (
         count(distinct transaction_sk) as transaction_count,
         count(distinct customer_sk) as customer_count,
         count(distinct merchant_sk) as merchant_count,
-        sum(amount) as total_amount,
-        avg(amount) as avg_amount,
-        min(amount) as min_amount,
-        max(amount) as max_amount,
+        sum(amount_usd) as total_amount_usd,
+        avg(amount_usd) as avg_amount_usd,
+        min(amount_usd) as min_amount_usd,
+        max(amount_usd) as max_amount_usd,
         array_agg(distinct currency) as currencies
     from fact_transactions
     group by 1
@@ -44,8 +44,8 @@ daily_merchant_transactions as (
         merchant_sk,
         count(distinct transaction_sk) as transaction_count,
         count(distinct customer_sk) as customer_count,
-        sum(amount) as total_amount,
-        avg(amount) as avg_amount
+        sum(amount_usd) as total_amount_usd,
+        avg(amount_usd) as avg_amount_usd
     from fact_transactions
     group by 1, 2
 ),
@@ -56,7 +56,7 @@ daily_status_transactions as (
         transaction_date_key,
         status,
         count(distinct transaction_sk) as transaction_count,
-        sum(amount) as total_amount
+        sum(amount_usd) as total_amount_usd
     from fact_transactions
     group by 1, 2
 ),
@@ -80,23 +80,23 @@ final as (
         dt.transaction_count,
         dt.customer_count,
         dt.merchant_count,
-        dt.total_amount,
-        dt.avg_amount,
-        dt.min_amount,
-        dt.max_amount,
+        dt.total_amount_usd,
+        dt.avg_amount_usd,
+        dt.min_amount_usd,
+        dt.max_amount_usd,
         dt.currencies,
         
         -- Status metrics
         sum(case when dst.status = 'completed' then dst.transaction_count else 0 end) as completed_count,
-        sum(case when dst.status = 'completed' then dst.total_amount else 0 end) as completed_amount,
+        sum(case when dst.status = 'completed' then dst.total_amount_usd else 0 end) as completed_amount_usd,
         sum(case when dst.status = 'pending' then dst.transaction_count else 0 end) as pending_count,
-        sum(case when dst.status = 'pending' then dst.total_amount else 0 end) as pending_amount,
+        sum(case when dst.status = 'pending' then dst.total_amount_usd else 0 end) as pending_amount_usd,
         sum(case when dst.status = 'failed' then dst.transaction_count else 0 end) as failed_count,
-        sum(case when dst.status = 'failed' then dst.total_amount else 0 end) as failed_amount,
+        sum(case when dst.status = 'failed' then dst.total_amount_usd else 0 end) as failed_amount_usd,
         sum(case when dst.status = 'cancelled' then dst.transaction_count else 0 end) as cancelled_count,
-        sum(case when dst.status = 'cancelled' then dst.total_amount else 0 end) as cancelled_amount,
+        sum(case when dst.status = 'cancelled' then dst.total_amount_usd else 0 end) as cancelled_amount_usd,
         sum(case when dst.status = 'refunded' then dst.transaction_count else 0 end) as refunded_count,
-        sum(case when dst.status = 'refunded' then dst.total_amount else 0 end) as refunded_amount,
+        sum(case when dst.status = 'refunded' then dst.total_amount_usd else 0 end) as refunded_amount_usd,
         
         -- Top merchants (limited to top 5 for simplicity)
         array(
@@ -104,12 +104,12 @@ final as (
                 'merchant_sk', dmt.merchant_sk,
                 'merchant_name', m.merchant_name,
                 'transaction_count', dmt.transaction_count,
-                'total_amount', dmt.total_amount
+                'total_amount_usd', dmt.total_amount_usd
             )
             from daily_merchant_transactions dmt
             left join dim_merchants m on dmt.merchant_sk = m.merchant_sk
             where dmt.transaction_date_key = dt.transaction_date_key
-            order by dmt.total_amount desc
+            order by dmt.total_amount_usd desc
             limit 5
         ) as top_merchants,
         
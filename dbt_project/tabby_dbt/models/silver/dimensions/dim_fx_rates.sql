@@ -0,0 +1,51 @@
+{{
+    config(
+        materialized='table',
+        tags=['finance', 'silver']
+    )
+}}
+
+with fx_rates as (
+    select * from {{ ref('fx_rates') }}
+),
+
+dim_dates as (
+    select * from {{ ref('dim_dates') }}
+),
+
+currencies as (
+    select distinct currency from fx_rates
+),
+
+-- The as-of lookup is resolved here, once per currency and day, so facts can
+-- convert with an equi-join on (currency, date). Per-row as-of joins against
+-- the sparse rates file cost more than the rest of the fact build, see
+-- scripts/benchmark_fx_conversion.py
+daily_rates as (
+    select
+        d.date_key,
+        c.currency,
+        r.rate_date,
+        r.usd_per_unit
+    from dim_dates d
+    cross join currencies c
+    -- Latest published rate on or before each day
+    asof join fx_rates r
+        on c.currency = r.currency
+        and d.date_key >= r.rate_date
+),
+
+final as (
+    select
+        date_key,
+        currency,
+        usd_per_unit,
+        rate_date,
+
+        -- Add metadata
+        current_timestamp as dbt_updated_at
+    from daily_rates
+)
+
+select * from final
+order by currency, date_key
@@ -5,6 +5,9 @@
     )
 }}
 
+-- Value domains of the columns stored as ENUMs, read in one pass
+{%- set enum_domains = enum_domains(ref('stg_user_events'), ['event_type', 'platform', 'device_type', 'country']) %}
+
 with stg_user_events as (
     select * from {{ ref('stg_user_events') }}
 ),
@@ -49,11 +52,11 @@ final as (
         
         -- Event details
         event_timestamp,
-        event_type,
-        platform,
+        {{ enum_cast('event_type', enum_domains) }} as event_type,
+        {{ enum_cast('platform', enum_domains) }} as platform,
         session_id,
-        device_type,
-        country,
+        {{ enum_cast('device_type', enum_domains) }} as device_type,
+        {{ enum_cast('country', enum_domains) }} as country,
         
         -- Add metadata
         _etl_extracted_at as source_extracted_at,
@@ -61,4 +64,6 @@ final as (
     from events_with_sk
 )
 
-select * from final
\ No newline at end of file
+-- Clustered by date so date-range scans can skip row groups
+select * from final
+order by event_date_key
\ No newline at end of file
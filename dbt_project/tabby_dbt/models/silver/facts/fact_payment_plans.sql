@@ -5,6 +5,9 @@
     )
 }}
 
+-- Value domains of the columns stored as ENUMs, read in one pass
+{%- set enum_domains = enum_domains(ref('stg_payment_plans'), ['status']) %}
+
 with stg_payment_plans as (
     select * from {{ ref('stg_payment_plans') }}
 ),
@@ -29,6 +32,16 @@ payment_plans_with_sk as (
     select
         p.plan_id,
         t.transaction_sk,
+        -- fact_transactions always has a rate, so a missing one means the plan's
+        -- transaction is missing. The plan would silently drop out of every USD
+        -- total, so it fails the build instead
+        case
+            when t.fx_rate_to_usd is null then error(concat(
+                'No USD rate for payment plan ', p.plan_id,
+                ': transaction ', coalesce(p.transaction_id, 'NULL'), ' is not in fact_transactions'
+            ))
+            else t.fx_rate_to_usd
+        end as fx_rate_to_usd,
         c.customer_sk,
         m.merchant_sk,
         p.plan_date,
@@ -74,15 +87,19 @@ final as (
         -- Plan details
         p.plan_date,
         p.total_amount,
+        -- Converted at the rate of the originating transaction
+        p.fx_rate_to_usd,
+        round(p.total_amount * p.fx_rate_to_usd, 2) as total_amount_usd,
         p.installment_count,
         p.first_installment_amount,
-        p.status,
+        {{ enum_cast('status', enum_domains) }} as status,
         
         -- Metrics from installments
         coalesce(m.total_installments, 0) as total_installments,
         coalesce(m.paid_installments, 0) as paid_installments,
         coalesce(m.defaulted_installments, 0) as defaulted_installments,
         coalesce(m.total_paid_amount, 0) as total_paid_amount,
+        round(coalesce(m.total_paid_amount, 0) * p.fx_rate_to_usd, 2) as total_paid_amount_usd,
         m.avg_days_late,
         
         -- Calculated metrics
@@ -98,4 +115,6 @@ final as (
     left join payment_plan_metrics m on p.plan_id = m.plan_id
 )
 
-select * from final
\ No newline at end of file
+-- Clustered by date so date-range scans can skip row groups
+select * from final
+order by plan_date_key
\ No newline at end of file
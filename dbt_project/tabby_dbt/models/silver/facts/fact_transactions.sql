@@ -5,6 +5,9 @@
     )
 }}
 
+-- Value domains of the columns stored as ENUMs, read in one pass
+{%- set enum_domains = enum_domains(ref('stg_transactions'), ['currency', 'payment_method', 'status']) %}
+
 with stg_transactions as (
     select * from {{ ref('stg_transactions') }}
 ),
@@ -17,6 +20,10 @@ dim_merchants as (
     select * from {{ ref('dim_merchants') }}
 ),
 
+dim_fx_rates as (
+    select * from {{ ref('dim_fx_rates') }}
+),
+
 transactions_with_sk as (
     select
         t.transaction_id,
@@ -27,12 +34,25 @@ transactions_with_sk as (
  -- Date key for dim_dates
         t.amount,
         t.currency,
+        -- A transaction without a rate would silently drop out of every USD
+        -- total, so it fails the build instead
+        case
+            when fx.usd_per_unit is null then error(concat(
+                'No USD rate for currency ', coalesce(t.currency, 'NULL'), ' on ', cast(t.transaction_date as date),
+                ' (transaction ', t.transaction_id, '), add it to seeds/fx_rates.csv'
+            ))
+            else fx.usd_per_unit
+        end as fx_rate_to_usd,
         t.payment_method,
         t.status,
         t._etl_extracted_at
     from stg_transactions t
     left join dim_customers c on t.customer_id = c.customer_id
     left join dim_merchants m on t.merchant_id = m.merchant_id
+    -- Daily rates already carry the latest rate on or before each date
+    left join dim_fx_rates fx
+        on t.currency = fx.currency
+        and cast(t.transaction_date as date) = fx.date_key
 ),
 
 final as (
@@ -49,9 +69,12 @@ final as (
         -- Transaction details
         transaction_date,
         amount,
-        currency,
-        payment_method,
-        status,
+        {{ enum_cast('currency', enum_domains) }} as currency,
+        -- Converted once here so downstream totals are plain sums
+        fx_rate_to_usd,
+        round(amount * fx_rate_to_usd, 2) as amount_usd,
+        {{ enum_cast('payment_method', enum_domains) }} as payment_method,
+        {{ enum_cast('status', enum_domains) }} as status,
         
         -- Add metadata
         _etl_extracted_at as source_extracted_at,
@@ -59,4 +82,6 @@ final as (
     from transactions_with_sk
 )
 
-select * from final
\ No newline at end of file
+-- Clustered by date so date-range scans can skip row groups
+select * from final
+order by transaction_date_key
\ No newline at end of file
@@ -0,0 +1,146 @@
+"""
+Build cost benchmark for the USD conversion in fact_transactions
+Builds the same synthetic transactions with no conversion, with a per-row
+as-of join against the sparse rates file, and with the equi-join against
+daily rates that dim_fx_rates provides. Runs in a scratch database under the
+warehouse's DuckDB budget and extrapolates the cost to a billion rows
+"""
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import logging
+
+from bronze_layer_etl import DUCKDB_TEMP_DIRECTORY, connect_duckdb
+
+
+#set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s- %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger('fx-benchmark')
+
+
+FX_RATES_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'dbt_project', 'tabby_dbt', 'seeds', 'fx_rates.csv'
+)
+
+CURRENCIES = ['AED', 'SAR', 'EGP', 'KWD']
+DATE_SPAN_DAYS = 3 * 365
+
+# Synthetic transactions spread over DATE_SPAN_DAYS in random order, like staging
+TRANSACTIONS_QUERY = f"""
+    SELECT
+        i AS transaction_id,
+        DATE '2023-01-01' + CAST(hash(i) % {DATE_SPAN_DAYS} AS INTEGER) AS transaction_date_key,
+        {CURRENCIES}[1 + CAST(hash(i, 'currency') % {len(CURRENCIES)} AS INTEGER)] AS currency,
+        CAST(hash(i, 'amount') % 100000 AS DOUBLE) / 100 AS amount
+    FROM range({{rows}}) t(i)
+"""
+
+# Each strategy builds the same table, only the conversion differs
+STRATEGIES = {
+    'no conversion': """
+        CREATE OR REPLACE TABLE fact_out AS
+        SELECT t.*
+        FROM transactions t
+        ORDER BY transaction_date_key
+    """,
+    # Sorts every transaction into the rate intervals
+    'as-of join': """
+        CREATE OR REPLACE TABLE fact_out AS
+        SELECT
+            t.*,
+            fx.usd_per_unit AS fx_rate_to_usd,
+            round(t.amount * fx.usd_per_unit, 2) AS amount_usd
+        FROM transactions t
+        ASOF LEFT JOIN fx_rates fx
+            ON t.currency = fx.currency
+            AND t.transaction_date_key >= fx.rate_date
+        ORDER BY transaction_date_key
+    """,
+    # What fact_transactions does: a hash join against one rate per currency and day
+    'daily rate join': """
+        CREATE OR REPLACE TABLE fact_out AS
+        SELECT
+            t.*,
+            fx.usd_per_unit AS fx_rate_to_usd,
+            round(t.amount * fx.usd_per_unit, 2) AS amount_usd
+        FROM transactions t
+        LEFT JOIN daily_fx_rates fx
+            ON t.currency = fx.currency
+            AND t.transaction_date_key = fx.date_key
+        ORDER BY transaction_date_key
+    """,
+}
+
+
+def run_benchmark(rows, repeat):
+    work_dir = tempfile.mkdtemp(prefix='fx_benchmark_', dir=os.path.dirname(DUCKDB_TEMP_DIRECTORY))
+    conn = connect_duckdb(os.path.join(work_dir, 'benchmark.duckdb'))
+
+    try:
+        logger.info(f"Generating {rows:,} synthetic transactions")
+        conn.execute(f"CREATE TABLE transactions AS {TRANSACTIONS_QUERY.format(rows=rows)}")
+        conn.execute(f"""
+            CREATE TABLE fx_rates AS
+            SELECT * FROM read_csv('{FX_RATES_PATH}', header = true,
+                columns = {{'rate_date': 'DATE', 'currency': 'VARCHAR', 'usd_per_unit': 'DOUBLE'}})
+        """)
+        # Same shape as dim_fx_rates
+        conn.execute("""
+            CREATE TABLE daily_fx_rates AS
+            SELECT d.date_key, c.currency, r.usd_per_unit
+            FROM (SELECT CAST(range AS DATE) AS date_key
+                  FROM range(DATE '2020-01-01', current_date + INTERVAL 3 YEAR, INTERVAL 1 DAY)) d
+            CROSS JOIN (SELECT DISTINCT currency FROM fx_rates) c
+            ASOF JOIN fx_rates r ON c.currency = r.currency AND d.date_key >= r.rate_date
+        """)
+
+        timings = {}
+        for name, query in STRATEGIES.items():
+            runs = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                conn.execute(query)
+                runs.append(time.perf_counter() - started)
+            timings[name] = min(runs)
+            logger.info(f"{name}: best of {repeat} runs {timings[name]:.2f}s")
+
+        # Every transaction must have found a rate, and both strategies must agree
+        mismatched = conn.execute("""
+            SELECT count(*)
+            FROM transactions t
+            ASOF JOIN fx_rates a ON t.currency = a.currency AND t.transaction_date_key >= a.rate_date
+            JOIN daily_fx_rates d ON t.currency = d.currency AND t.transaction_date_key = d.date_key
+            WHERE a.usd_per_unit <> d.usd_per_unit
+        """).fetchone()[0]
+        if mismatched:
+            logger.warning(f"{mismatched:,} transactions got a different rate from the daily rates")
+        unconverted = conn.execute("SELECT count(*) FROM fact_out WHERE amount_usd IS NULL").fetchone()[0]
+        if unconverted:
+            logger.warning(f"{unconverted:,} transactions have no rate on or before their date")
+
+        baseline = timings['no conversion']
+        print(f"\nUSD conversion build cost ({rows:,} rows)")
+        print(f"  {'strategy':<16} {'seconds':>9} {'rows/s':>14} {'s per 1B rows':>14} {'overhead':>9}")
+        for name, seconds in timings.items():
+            print(f"  {name:<16} {seconds:9.2f} {rows / seconds:14,.0f} "
+                  f"{seconds * 1e9 / rows:14,.0f} {seconds / baseline - 1:9.1%}")
+
+    finally:
+        conn.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the USD conversion in fact_transactions")
+    parser.add_argument('--rows', type=int, default=100_000_000, help="Synthetic transactions to convert")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per strategy, the fastest is reported")
+    args = parser.parse_args()
+
+    run_benchmark(args.rows, args.repeat)
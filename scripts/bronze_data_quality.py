@@ -0,0 +1,291 @@
+"""
+Data quality checks for the Bronze layer
+Profiles and validates each extracted batch in a single pass before it is loaded,
+so bad batches are quarantined instead of reaching dbt
+"""
+
+from datetime import datetime, timedelta
+import logging
+
+
+logger = logging.getLogger('bronze-dq')
+
+
+QUARANTINE_SCHEMA = "bronze_quarantine"
+AUDIT_SCHEMA = "bronze_audit"
+DQ_RESULTS_TABLE = f"{AUDIT_SCHEMA}.dq_results"
+
+# Name the batch is registered under while it is profiled
+BATCH_VIEW = "_dq_batch"
+
+# Dates a little in the future are tolerated to absorb clock skew between systems
+MAX_FUTURE_SKEW = timedelta(days=1)
+MIN_BUSINESS_DATE = "2015-01-01"
+MAX_AMOUNT = 1_000_000
+
+# Per-table rules. Tables must be loaded parents-first so that foreign keys
+# can be checked against the already-loaded bronze parent.
+#   key          - natural key, must be unique and not null
+#   not_null     - required columns
+#   foreign_keys - column -> (bronze parent table, parent key); nulls are allowed
+#   ranges       - column -> (low, high) or (low, high, severity), inclusive;
+#                  'now' is the load time, severity defaults to 'error'.
+#                  Values that do not parse as the bound's type count as
+#                  violations (dates arrive as text from the Postgres source)
+DQ_RULES = {
+    'customers': {
+        'key': 'customer_id',
+        'not_null': ['customer_id', 'email', 'country', 'registration_date', 'status'],
+        'foreign_keys': {},
+        'ranges': {
+            'registration_date': (MIN_BUSINESS_DATE, 'now'),
+        },
+    },
+    'merchants': {
+        'key': 'merchant_id',
+        'not_null': ['merchant_id', 'merchant_name', 'category', 'onboarding_date', 'status'],
+        'foreign_keys': {},
+        'ranges': {
+            'onboarding_date': (MIN_BUSINESS_DATE, 'now'),
+        },
+    },
+    'transactions': {
+        'key': 'transaction_id',
+        'not_null': ['transaction_id', 'customer_id', 'merchant_id', 'transaction_date', 'amount', 'currency', 'status'],
+        'foreign_keys': {
+            'customer_id': ('customers', 'customer_id'),
+            'merchant_id': ('merchants', 'merchant_id'),
+        },
+        'ranges': {
+            'amount': (0.01, MAX_AMOUNT),
+            'transaction_date': (MIN_BUSINESS_DATE, 'now'),
+        },
+    },
+    'payment_plans': {
+        'key': 'plan_id',
+        'not_null': ['plan_id', 'transaction_id', 'customer_id', 'merchant_id', 'plan_date', 'total_amount', 'installment_count'],
+        'foreign_keys': {
+            'transaction_id': ('transactions', 'transaction_id'),
+            'customer_id': ('customers', 'customer_id'),
+            'merchant_id': ('merchants', 'merchant_id'),
+        },
+        'ranges': {
+            'total_amount': (0.01, MAX_AMOUNT),
+            'first_installment_amount': (0, MAX_AMOUNT),
+            'installment_count': (1, 24),
+            'plan_date': (MIN_BUSINESS_DATE, 'now'),
+        },
+    },
+    'installments': {
+        'key': 'installment_id',
+        'not_null': ['installment_id', 'plan_id', 'installment_number', 'amount', 'due_date', 'status'],
+        'foreign_keys': {
+            'plan_id': ('payment_plans', 'plan_id'),
+        },
+        'ranges': {
+            'amount': (0, MAX_AMOUNT),
+            'installment_number': (1, 24),
+            'due_date': (MIN_BUSINESS_DATE, None),
+            # Source systems record scheduled late payments ahead of time, up
+            # to 30 days past a due date that may itself be today
+            'paid_date': (MIN_BUSINESS_DATE, 'now', 'warn'),
+        },
+    },
+    'user_events': {
+        'key': 'event_id',
+        'not_null': ['event_id', 'event_timestamp', 'event_type'],
+        'foreign_keys': {
+            'customer_id': ('customers', 'customer_id'),
+            'merchant_id': ('merchants', 'merchant_id'),
+        },
+        'ranges': {
+            'event_timestamp': (MIN_BUSINESS_DATE, 'now'),
+        },
+    },
+}
+
+
+def ensure_quality_schemas(conn):
+    """Create the quarantine and audit schemas and the results table"""
+    conn.execute(f"CREATE SCHEMA IF NOT EXISTS {QUARANTINE_SCHEMA}")
+    conn.execute(f"CREATE SCHEMA IF NOT EXISTS {AUDIT_SCHEMA}")
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {DQ_RESULTS_TABLE} (
+            run_id VARCHAR,
+            table_name VARCHAR,
+            check_name VARCHAR,
+            column_name VARCHAR,
+            observed DOUBLE,
+            threshold DOUBLE,
+            passed BOOLEAN,
+            severity VARCHAR,
+            checked_at TIMESTAMP
+        )
+    """)
+
+
+def _bound_literal(value, now):
+    """Render a range bound as a SQL literal"""
+    if value == 'now':
+        return f"TIMESTAMP '{now + MAX_FUTURE_SKEW:%Y-%m-%d %H:%M:%S}'"
+    if isinstance(value, str):
+        return f"TIMESTAMP '{value}'"
+    return repr(value)
+
+
+def _range_type(low, high):
+    """Type a column is cast to before comparing it with its range bounds"""
+    if isinstance(low, str) or isinstance(high, str):
+        return 'TIMESTAMP'
+    return 'DOUBLE'
+
+
+def _bronze_table_exists(conn, table_name):
+    return conn.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = 'bronze' AND table_name = ?",
+        [table_name]
+    ).fetchone()[0] > 0
+
+
+def build_profile_query(conn, table_name, columns, rules, now):
+    """
+    Build one aggregate query that computes every metric for the batch.
+    Parents are joined as distinct key sets so the batch itself is scanned once.
+    Returns the query and the list of foreign keys that were skipped.
+    """
+    select_exprs = ["count(*) AS row_count"]
+    joins = []
+    skipped_fks = []
+
+    # Null counts for every column, required or not, for profiling
+    for col in columns:
+        select_exprs.append(f'count(*) - count(b."{col}") AS "null__{col}"')
+
+    # Uniqueness via hashing: every distinct hash stands for one distinct key
+    key = rules.get('key')
+    if key:
+        select_exprs.append(f'count(b."{key}") - count(DISTINCT hash(b."{key}")) AS "dup__{key}"')
+
+    for i, (col, (parent, parent_key)) in enumerate(rules.get('foreign_keys', {}).items()):
+        if not _bronze_table_exists(conn, parent):
+            skipped_fks.append(col)
+            continue
+        joins.append(
+            f'LEFT JOIN (SELECT DISTINCT "{parent_key}" AS k FROM bronze.{parent}) p{i} ON b."{col}" = p{i}.k'
+        )
+        select_exprs.append(f'count(*) FILTER (WHERE b."{col}" IS NOT NULL AND p{i}.k IS NULL) AS "orphan__{col}"')
+
+    for col, (low, high, *_) in rules.get('ranges', {}).items():
+        # The batch keeps the source's types, e.g. dates loaded as TEXT
+        value = f'TRY_CAST(b."{col}" AS {_range_type(low, high)})'
+        conditions = [f'(b."{col}" IS NOT NULL AND {value} IS NULL)']
+        if low is not None:
+            conditions.append(f'{value} < {_bound_literal(low, now)}')
+        if high is not None:
+            conditions.append(f'{value} > {_bound_literal(high, now)}')
+        select_exprs.append(f'count(*) FILTER (WHERE {" OR ".join(conditions)}) AS "range__{col}"')
+
+    query = "SELECT\n    " + ",\n    ".join(select_exprs) + f"\nFROM {BATCH_VIEW} b\n" + "\n".join(joins)
+    return query, skipped_fks
+
+
+def run_quality_checks(conn, df, table_name, run_id):
+    """Profile and validate a batch, returning one result row per check"""
+    rules = DQ_RULES.get(table_name, {})
+    now = datetime.now()
+    columns = [col for col in df.columns if not col.startswith('_etl_')]
+
+    conn.register(BATCH_VIEW, df)
+    try:
+        query, skipped_fks = build_profile_query(conn, table_name, columns, rules, now)
+        cursor = conn.execute(query)
+        names = [desc[0] for desc in cursor.description]
+        metrics = dict(zip(names, cursor.fetchone()))
+    finally:
+        conn.unregister(BATCH_VIEW)
+
+    row_count = metrics['row_count']
+    results = []
+
+    def add(check_name, column_name, observed, threshold, passed, severity):
+        results.append({
+            'run_id': run_id,
+            'table_name': table_name,
+            'check_name': check_name,
+            'column_name': column_name,
+            'observed': observed,
+            'threshold': threshold,
+            'passed': passed,
+            'severity': severity,
+            'checked_at': now,
+        })
+
+    # An empty batch would truncate the bronze table
+    add('row_count', None, row_count, 1, row_count >= 1, 'error')
+
+    required = set(rules.get('not_null', []))
+    for col in columns:
+        null_rate = metrics[f"null__{col}"] / row_count if row_count else 0.0
+        if col in required:
+            add('not_null', col, null_rate, 0.0, null_rate == 0, 'error')
+        else:
+            add('null_rate', col, null_rate, None, True, 'info')
+
+    key = rules.get('key')
+    if key:
+        duplicates = metrics[f"dup__{key}"]
+        add('unique', key, duplicates, 0, duplicates == 0, 'error')
+
+    for col in rules.get('foreign_keys', {}):
+        if col in skipped_fks:
+            logger.warning(f"Skipping referential check on {table_name}.{col}: parent not loaded")
+            add('relationship', col, None, 0, True, 'skipped')
+            continue
+        orphans = metrics[f"orphan__{col}"]
+        add('relationship', col, orphans, 0, orphans == 0, 'error')
+
+    for col, (_, _, *severity) in rules.get('ranges', {}).items():
+        violations = metrics[f"range__{col}"]
+        add('range', col, violations, 0, violations == 0, severity[0] if severity else 'error')
+
+    return results
+
+
+def batch_passed(results):
+    """A batch passes when none of its error-severity checks failed"""
+    return all(r['passed'] for r in results if r['severity'] == 'error')
+
+
+def record_quality_results(conn, results):
+    """Append check results to the audit table"""
+    conn.executemany(
+        f"INSERT INTO {DQ_RESULTS_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [
+            [r['run_id'], r['table_name'], r['check_name'], r['column_name'], r['observed'],
+             r['threshold'], r['passed'], r['severity'], r['checked_at']]
+            for r in results
+        ]
+    )
+
+    for r in results:
+        if not r['passed']:
+            log = logger.error if r['severity'] == 'error' else logger.warning
+            log(
+                f"DQ check failed on {r['table_name']}: {r['check_name']}"
+                f"({r['column_name'] or '*'}) observed={r['observed']} threshold={r['threshold']}"
+                f" severity={r['severity']}"
+            )
+
+
+def quarantine_batch(conn, df, table_name, run_id):
+    """Park a failed batch in the quarantine schema, leaving bronze untouched"""
+    quarantine_table = f"{QUARANTINE_SCHEMA}.{table_name}"
+    conn.register(BATCH_VIEW, df)
+    try:
+        conn.execute(
+            f"CREATE OR REPLACE TABLE {quarantine_table} AS SELECT *, ? AS _dq_run_id FROM {BATCH_VIEW}",
+            [run_id]
+        )
+    finally:
+        conn.unregister(BATCH_VIEW)
+    logger.warning(f"Quarantined {len(df)} records from {table_name} into {quarantine_table}")
@@ -0,0 +1,310 @@
+"""
+dbt model profiler for Tabby DWH project
+Builds the silver and gold models, then re-runs each model's compiled query
+under DuckDB's EXPLAIN ANALYZE to break its cost down by operator. Writes a
+ranked report, a JSON profile and folded stacks for flame graphs, and
+compares the run with the previous profile.
+"""
+
+import os
+import re
+import glob
+import json
+import argparse
+from datetime import datetime
+import logging
+
+from bronze_layer_etl import DUCKDB_PATH, DUCKDB_MEMORY_LIMIT, DUCKDB_THREADS, connect_duckdb
+from tabby_dbt import DBT_PROJECT_DIR, dbt_time_to_local
+
+
+#set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s- %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger('dbt-profiler')
+
+
+MODEL_PROFILES_DIR = os.path.join(os.path.dirname(DUCKDB_PATH), 'model_profiles')
+
+PROFILED_LAYERS = ['silver', 'gold']
+
+# Function calls shown next to an operator, e.g. count(DISTINCT) or md5.
+# DuckDB's own __internal_* functions (e.g. the compress/decompress casts
+# added by the optimizer) are left out
+FUNCTION_PATTERN = re.compile(r"\b(?!__internal)(\w+)\((DISTINCT )?")
+MAX_FUNCTIONS_SHOWN = 4
+
+
+def invoke_dbt(command, select):
+    """Run dbt in-process and return its per-node results"""
+    # dbt is imported lazily, it is slow to import and only needed here
+    from dbt.cli.main import dbtRunner
+
+    res = dbtRunner().invoke([
+        command,
+        '--project-dir', DBT_PROJECT_DIR,
+        '--profiles-dir', DBT_PROJECT_DIR,
+        '--select', *select,
+    ])
+    if res.exception is not None:
+        raise RuntimeError(f"dbt {command} failed: {res.exception}")
+    return res.result
+
+
+def _operator_name(op):
+    # JSON keys were renamed in DuckDB 1.1
+    return op.get('operator_name') or op.get('name') or op.get('operator_type') or '?'
+
+
+def describe_operator(op):
+    """Operator name plus the table it scans or the functions it evaluates"""
+    name = _operator_name(op).strip()
+    info = op.get('extra_info')
+    if not isinstance(info, dict):
+        return name
+
+    if info.get('Table'):
+        return f"{name} {info['Table'].split('.')[-1]}"
+
+    expressions = info.get('Aggregates') or info.get('Projections') or info.get('Conditions') or []
+    if isinstance(expressions, str):
+        expressions = [expressions]
+
+    functions = []
+    for expression in expressions:
+        for function, distinct in FUNCTION_PATTERN.findall(expression):
+            label = f"{function}(DISTINCT)" if distinct else function
+            if label not in functions:
+                functions.append(label)
+    if functions:
+        return f"{name} [{', '.join(functions[:MAX_FUNCTIONS_SHOWN])}]"
+    return name
+
+
+def flatten_operators(op, stack, operators):
+    """Collect every operator with its path from the query root"""
+    frame = describe_operator(op).replace(';', ',')
+    path = stack + [frame]
+    operators.append({
+        'stack': path,
+        'seconds': op.get('operator_timing', op.get('timing', 0.0)) or 0.0,
+        'rows': op.get('operator_cardinality', op.get('cardinality', 0)) or 0,
+        'rows_scanned': op.get('operator_rows_scanned', 0) or 0,
+    })
+    for child in op.get('children', []):
+        flatten_operators(child, path, operators)
+
+
+def result_operator(op):
+    """The operator producing the query result, below any materialized CTEs"""
+    # A CTE operator builds its definition first and runs the consuming query last
+    while _operator_name(op).strip() == 'CTE' and op.get('children'):
+        op = op['children'][-1]
+    return op
+
+
+def apply_model_budget(conn, node):
+    """Profile each model under the same settings macros/resource_limits.sql gives it"""
+    memory_limit = node.config.get('duckdb_memory_limit') or DUCKDB_MEMORY_LIMIT
+    threads = node.config.get('duckdb_threads') or DUCKDB_THREADS
+    preserve_order = node.config.get('duckdb_preserve_insertion_order')
+    conn.execute(f"SET memory_limit = '{memory_limit}'")
+    conn.execute(f"SET threads = {threads}")
+    conn.execute(f"SET preserve_insertion_order = {'true' if preserve_order is None else preserve_order}")
+
+
+def profile_query(conn, sql):
+    """EXPLAIN ANALYZE a model query and summarise its operator tree"""
+    plan = json.loads(conn.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}").fetchall()[0][1])
+    query_root = plan['children'][0]
+    # Skip the EXPLAIN_ANALYZE operator wrapping the model query
+    if _operator_name(query_root).strip() == 'EXPLAIN_ANALYZE':
+        query_root = query_root['children'][0]
+
+    operators = []
+    flatten_operators(query_root, [], operators)
+    result = result_operator(query_root)
+
+    rows_in = plan.get('cumulative_rows_scanned')
+    if rows_in is None:
+        rows_in = sum(op['rows'] for op in operators if 'SCAN' in op['stack'][-1])
+
+    return {
+        'query_seconds': plan.get('latency', plan.get('timing')),
+        'cpu_seconds': plan.get('cpu_time'),
+        'rows_in': rows_in,
+        'rows_out': result.get('operator_cardinality', result.get('cardinality')),
+        # Reported from DuckDB 1.1 onwards. The buffer peak is instance-wide and
+        # includes blocks cached by earlier queries, so it is not per model
+        'instance_peak_memory_bytes': plan.get('system_peak_buffer_memory'),
+        'spill_bytes': plan.get('system_peak_temp_dir_size'),
+        'operators': operators,
+    }
+
+
+def profile_models(run_models=True, select=None):
+    """Build (or compile) the selected models and profile each one in isolation"""
+    select = select or PROFILED_LAYERS
+    run_id = datetime.now().strftime("%Y%m%d%H%M%S")
+
+    if run_models:
+        logger.info(f"Building {' '.join(select)} with dbt")
+        result = invoke_dbt('run', [f"+{s}" for s in select])
+    else:
+        logger.info(f"Compiling {' '.join(select)}, profiling against the existing tables")
+        result = invoke_dbt('compile', select)
+
+    profile = {
+        'run_id': run_id,
+        'started_at': datetime.now().isoformat(),
+        'dbt_command': 'run' if run_models else 'compile',
+        'dbt_elapsed_seconds': result.elapsed_time if run_models else None,
+        'models': {},
+    }
+
+    conn = connect_duckdb()
+    try:
+        profile['duckdb_version'] = conn.execute("SELECT version()").fetchone()[0]
+        # Models are profiled one at a time, so their timings are not skewed by each other
+        for r in result.results:
+            node = r.node
+            layer = node.fqn[1] if len(node.fqn) > 2 else None
+            # dbt compile also returns the data tests of the selected models
+            if node.resource_type != 'model' or layer not in PROFILED_LAYERS or not node.compiled_code:
+                continue
+            if run_models and r.status != 'success':
+                logger.warning(f"{node.name} did not build ({r.status}), not profiled")
+                continue
+
+            logger.info(f"Profiling {node.name}")
+            apply_model_budget(conn, node)
+            model = {
+                'layer': layer,
+                'thread': r.thread_id if run_models else None,
+                'dbt_seconds': r.execution_time if run_models else None,
+                'dbt_started_at': None,
+            }
+            if run_models:
+                for timing in r.timing:
+                    if timing.name == 'execute' and timing.started_at:
+                        model['dbt_started_at'] = dbt_time_to_local(timing.started_at).isoformat()
+            try:
+                model.update(profile_query(conn, node.compiled_code))
+            except Exception as e:
+                logger.error(f"Could not profile {node.name}: {e}")
+                continue
+            profile['models'][node.name] = model
+    finally:
+        conn.close()
+
+    return profile
+
+
+def load_baseline(path=None, exclude=None):
+    """The given profile, or else the most recent one saved before this run"""
+    if path is None:
+        candidates = sorted(p for p in glob.glob(os.path.join(MODEL_PROFILES_DIR, 'profile_*.json')) if p != exclude)
+        if not candidates:
+            return None
+        path = candidates[-1]
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_profile(profile):
+    """Persist the JSON profile and folded stacks, one line per operator path"""
+    os.makedirs(MODEL_PROFILES_DIR, exist_ok=True)
+    json_path = os.path.join(MODEL_PROFILES_DIR, f"profile_{profile['run_id']}.json")
+    folded_path = os.path.join(MODEL_PROFILES_DIR, f"profile_{profile['run_id']}.folded")
+
+    with open(json_path, 'w') as f:
+        json.dump(profile, f, indent=2)
+
+    # Stacks are keyed by layer, model and operator path, so files from two
+    # runs can be fed to a differential flame graph
+    stacks = {}
+    for name, model in profile['models'].items():
+        for op in model['operators']:
+            key = ';'.join([model['layer'], name] + op['stack'])
+            stacks[key] = stacks.get(key, 0) + int(op['seconds'] * 1_000_000)
+    with open(folded_path, 'w') as f:
+        for key in sorted(stacks):
+            if stacks[key] > 0:
+                f.write(f"{key} {stacks[key]}\n")
+
+    return json_path, folded_path
+
+
+def _format_bytes(value):
+    return 'n/a' if value is None else f"{value / 2**20:,.1f} MB"
+
+
+def _format_delta(current, previous):
+    if current is None or previous is None:
+        return 'new' if previous is None else ''
+    change = current - previous
+    share = f" ({change / previous:+.0%})" if previous else ''
+    return f"{change:+.2f}s{share}"
+
+
+def print_report(profile, baseline=None, top=10):
+    """Models ranked by query time, then the hottest operators across all of them"""
+    models = sorted(profile['models'].items(), key=lambda item: item[1]['query_seconds'] or 0, reverse=True)
+    total = sum(m['query_seconds'] or 0 for _, m in models) or 1.0
+    previous = (baseline or {}).get('models', {})
+
+    print(f"\nModel profile {profile['run_id']} (DuckDB {profile.get('duckdb_version', '?')})")
+    if profile.get('dbt_elapsed_seconds'):
+        dbt_total = sum(m['dbt_seconds'] or 0 for _, m in models)
+        print(f"dbt run took {profile['dbt_elapsed_seconds']:.2f}s wall, "
+              f"{dbt_total:.2f}s summed over the profiled models")
+    peak_memory = max((m.get('instance_peak_memory_bytes') or 0 for _, m in models), default=0)
+    if peak_memory:
+        print(f"DuckDB buffer memory peaked at {_format_bytes(peak_memory)} while profiling (instance-wide)")
+    if baseline:
+        print(f"Compared with profile {baseline['run_id']}")
+
+    print(f"\n{'#':>3} {'model':<28} {'dbt':>8} {'query':>8} {'share':>6} {'rows in':>12} {'rows out':>10} "
+          f"{'spilled':>10}  {'hottest operator':<40} {'vs baseline':>14}")
+    for rank, (name, model) in enumerate(models, start=1):
+        hottest = max(model['operators'], key=lambda op: op['seconds'], default=None)
+        operator_total = sum(op['seconds'] for op in model['operators']) or 1.0
+        hottest_label = f"{hottest['stack'][-1][:34]:<34} {hottest['seconds'] / operator_total:>4.0%}" if hottest else ''
+        dbt_seconds = f"{model['dbt_seconds']:.2f}s" if model.get('dbt_seconds') is not None else '-'
+        print(f"{rank:>3} {name:<28} {dbt_seconds:>8} {model['query_seconds'] or 0:7.2f}s "
+              f"{(model['query_seconds'] or 0) / total:6.1%} {model['rows_in'] or 0:>12,} {model['rows_out'] or 0:>10,} "
+              f"{_format_bytes(model['spill_bytes']):>10}  "
+              f"{hottest_label:<40} "
+              f"{_format_delta(model['query_seconds'], previous.get(name, {}).get('query_seconds')) if baseline else '':>14}")
+
+    operators = [
+        (op['seconds'], name, op)
+        for name, model in profile['models'].items()
+        for op in model['operators']
+    ]
+    operators.sort(key=lambda item: item[0], reverse=True)
+    operator_total = sum(seconds for seconds, _, _ in operators) or 1.0
+
+    print(f"\nHottest operators (operator time summed over threads)")
+    for seconds, name, op in operators[:top]:
+        print(f"  {seconds:8.3f}s {seconds / operator_total:6.1%}  {name:<28} {op['stack'][-1]}  ({op['rows']:,} rows)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile the silver and gold dbt models")
+    parser.add_argument('--no-run', action='store_true',
+                        help="Compile instead of building, and profile against the existing tables")
+    parser.add_argument('--select', nargs='+', help="dbt selection to profile (default: silver gold)")
+    parser.add_argument('--baseline', help="Profile JSON to compare with (default: the previous profile)")
+    parser.add_argument('--top', type=int, default=10, help="Number of hottest operators to list")
+    args = parser.parse_args()
+
+    profile = profile_models(run_models=not args.no_run, select=args.select)
+    json_path, folded_path = write_profile(profile)
+    print_report(profile, load_baseline(args.baseline, exclude=json_path), top=args.top)
+
+    logger.info(f"Profile written to {json_path}")
+    logger.info(f"Flame graph input written to {folded_path} (flamegraph.pl or speedscope)")
@@ -0,0 +1,285 @@
+"""
+Customer 360 serving store refresh for Tabby DWH project
+Exports gold_customer_analytics plus per-customer plan, installment and event
+summaries from DuckDB into a key-indexed SQLite store for point lookups.
+Only customers whose data changed since the previous refresh are rewritten.
+"""
+
+import os
+import sqlite3
+import argparse
+from datetime import datetime
+import logging
+
+import pandas as pd
+
+from bronze_layer_etl import DUCKDB_PATH, connect_duckdb
+
+
+#set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s- %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger('customer-store')
+
+
+CUSTOMER_STORE_PATH = os.path.join(os.path.dirname(DUCKDB_PATH), "customer_360.sqlite")
+
+STAGING_SCHEMA = "bronze_staging"
+SILVER_SCHEMA = "bronze_silver"
+GOLD_SCHEMA = "bronze_gold"
+
+# Bumped whenever STORE_SCHEMA changes, a store with another version is rebuilt
+STORE_SCHEMA_VERSION = '2'
+
+RECENT_EVENTS_PER_CUSTOMER = 20
+FETCH_BATCH_SIZE = 50_000
+
+# Columns relative to the build date are computed at lookup time instead, so
+# that an unchanged customer keeps the same content hash from day to day
+PROFILE_EXCLUDED_COLUMNS = [
+    'customer_sk',
+    'days_since_registration',
+    'days_since_last_transaction',
+    'snapshot_date',
+    'dbt_updated_at',
+]
+
+STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS customers (
+    customer_id TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    refreshed_at TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS active_plans (
+    customer_id TEXT NOT NULL,
+    plan_id TEXT NOT NULL,
+    plan_date TEXT,
+    total_amount_usd REAL,
+    installment_count INTEGER,
+    paid_installments INTEGER,
+    total_paid_amount_usd REAL,
+    payment_completion_rate REAL,
+    PRIMARY KEY (customer_id, plan_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS overdue_installments (
+    customer_id TEXT NOT NULL,
+    installment_id TEXT NOT NULL,
+    plan_id TEXT,
+    installment_number INTEGER,
+    amount_usd REAL,
+    due_date TEXT,
+    status TEXT,
+    PRIMARY KEY (customer_id, installment_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS recent_events (
+    customer_id TEXT NOT NULL,
+    event_timestamp TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    event_type TEXT,
+    platform TEXT,
+    merchant_name TEXT,
+    PRIMARY KEY (customer_id, event_timestamp, event_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS store_metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT
+) WITHOUT ROWID;
+"""
+
+# Per-customer datasets staged in DuckDB, one scan of each source.
+# Every one of them has customer_id as its first column.
+STAGING_QUERIES = {
+    'c360_profiles': f"""
+        SELECT g.customer_id, to_json(g)::VARCHAR AS profile
+        FROM (
+            SELECT * EXCLUDE ({', '.join(PROFILE_EXCLUDED_COLUMNS)})
+                REPLACE (list_sort(currencies_used) AS currencies_used)
+            FROM {GOLD_SCHEMA}.gold_customer_analytics
+        ) g
+    """,
+    'active_plans': f"""
+        SELECT
+            c.customer_id,
+            p.plan_id,
+            CAST(p.plan_date AS VARCHAR) AS plan_date,
+            p.total_amount_usd,
+            p.installment_count,
+            p.paid_installments,
+            p.total_paid_amount_usd,
+            p.payment_completion_rate
+        FROM {SILVER_SCHEMA}.fact_payment_plans p
+        JOIN {SILVER_SCHEMA}.dim_customers c ON p.customer_sk = c.customer_sk
+        WHERE p.status = 'active'
+    """,
+    'overdue_installments': f"""
+        SELECT
+            c.customer_id,
+            i.installment_id,
+            i.plan_id,
+            i.installment_number,
+            -- Converted at the plan's rate, like its total_amount_usd
+            round(i.amount * p.fx_rate_to_usd, 2) AS amount_usd,
+            CAST(CAST(i.due_date AS DATE) AS VARCHAR) AS due_date,
+            CAST(i.status AS VARCHAR) AS status
+        FROM {STAGING_SCHEMA}.stg_installments i
+        JOIN {SILVER_SCHEMA}.fact_payment_plans p ON i.plan_id = p.plan_id
+        JOIN {SILVER_SCHEMA}.dim_customers c ON p.customer_sk = c.customer_sk
+        WHERE i.paid_date IS NULL
+            AND i.status NOT IN ('paid', 'paid_late')
+            AND CAST(i.due_date AS DATE) < current_date
+    """,
+    'recent_events': f"""
+        SELECT
+            c.customer_id,
+            CAST(e.event_timestamp AS VARCHAR) AS event_timestamp,
+            e.event_id,
+            CAST(e.event_type AS VARCHAR) AS event_type,
+            CAST(e.platform AS VARCHAR) AS platform,
+            m.merchant_name
+        FROM {SILVER_SCHEMA}.fact_customer_events e
+        JOIN {SILVER_SCHEMA}.dim_customers c ON e.customer_sk = c.customer_sk
+        LEFT JOIN {SILVER_SCHEMA}.dim_merchants m ON e.merchant_sk = m.merchant_sk
+        QUALIFY row_number() OVER (PARTITION BY e.customer_sk ORDER BY e.event_timestamp DESC) <= {RECENT_EVENTS_PER_CUSTOMER}
+    """,
+}
+
+CHILD_TABLES = ['active_plans', 'overdue_installments', 'recent_events']
+
+
+def ensure_store(store):
+    """Create the store tables, returns True when every customer must be rewritten"""
+    has_metadata = store.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'store_metadata'"
+    ).fetchone()[0]
+    version = store.execute(
+        "SELECT value FROM store_metadata WHERE key = 'schema_version'"
+    ).fetchone() if has_metadata else None
+
+    rebuild = version is None or version[0] != STORE_SCHEMA_VERSION
+    if rebuild:
+        if has_metadata:
+            logger.info(f"Customer 360 store schema changed, rebuilding it as version {STORE_SCHEMA_VERSION}")
+        with store:
+            for table in ['customers'] + CHILD_TABLES + ['store_metadata']:
+                store.execute(f"DROP TABLE IF EXISTS {table}")
+
+    store.executescript(STORE_SCHEMA)
+    # WAL lets the API keep reading while a refresh is being written
+    store.execute("PRAGMA journal_mode=WAL")
+    with store:
+        store.execute(
+            "INSERT OR REPLACE INTO store_metadata VALUES ('schema_version', ?)", [STORE_SCHEMA_VERSION]
+        )
+    return rebuild
+
+
+def stage_customer_data(conn):
+    """Materialize the per-customer datasets and a content hash per customer"""
+    for name, query in STAGING_QUERIES.items():
+        conn.execute(f"CREATE OR REPLACE TEMP TABLE {name} AS {query}")
+
+    # Child rows are combined with an order-independent hash aggregate
+    child_hashes = "\n".join(
+        f"LEFT JOIN (SELECT customer_id, bit_xor(hash({t})) AS h FROM {t} GROUP BY 1) {t}_h USING (customer_id)"
+        for t in CHILD_TABLES
+    )
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE c360_hashes AS
+        SELECT
+            p.customer_id,
+            CAST(hash(p.profile, {', '.join(f'{t}_h.h' for t in CHILD_TABLES)}) AS VARCHAR) AS content_hash
+        FROM c360_profiles p
+        {child_hashes}
+    """)
+
+
+def fetch_in_batches(cursor):
+    while True:
+        rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+        if not rows:
+            break
+        yield rows
+
+
+def refresh_customer_store(duckdb_path=DUCKDB_PATH, store_path=CUSTOMER_STORE_PATH, full_refresh=False):
+    """Bring the serving store in line with the current gold and silver tables"""
+    logger.info(f"Refreshing customer 360 store at {store_path}")
+    started_at = datetime.now()
+
+    conn = connect_duckdb(duckdb_path)
+    store = sqlite3.connect(store_path)
+
+    try:
+        full_refresh = ensure_store(store) or full_refresh
+        stage_customer_data(conn)
+
+        new_hashes = dict(conn.execute("SELECT customer_id, content_hash FROM c360_hashes").fetchall())
+        old_hashes = {} if full_refresh else dict(store.execute("SELECT customer_id, content_hash FROM customers"))
+
+        changed = [cid for cid, h in new_hashes.items() if old_hashes.get(cid) != h]
+        removed = [cid for cid in old_hashes if cid not in new_hashes]
+        logger.info(f"{len(changed)} customers changed, {len(removed)} removed, "
+                    f"{len(new_hashes) - len(changed)} unchanged")
+
+        refreshed_at = started_at.isoformat()
+        changed_df = pd.DataFrame({'customer_id': changed}, dtype=str)
+        conn.register('c360_changed', changed_df)
+
+        # One write transaction, readers keep seeing the previous version until commit
+        with store:
+            if full_refresh:
+                for table in ['customers'] + CHILD_TABLES:
+                    store.execute(f"DELETE FROM {table}")
+            else:
+                stale = [(cid,) for cid in changed + removed]
+                for table in ['customers'] + CHILD_TABLES:
+                    store.executemany(f"DELETE FROM {table} WHERE customer_id = ?", stale)
+
+            cursor = conn.execute("""
+                SELECT p.customer_id, h.content_hash, p.profile
+                FROM c360_profiles p
+                JOIN c360_hashes h USING (customer_id)
+                SEMI JOIN c360_changed USING (customer_id)
+            """)
+            for rows in fetch_in_batches(cursor):
+                store.executemany(
+                    "INSERT INTO customers VALUES (?, ?, ?, ?)",
+                    [row + (refreshed_at,) for row in rows]
+                )
+
+            for table in CHILD_TABLES:
+                cursor = conn.execute(f"SELECT * FROM {table} SEMI JOIN c360_changed USING (customer_id)")
+                placeholders = ', '.join('?' for _ in cursor.description)
+                for rows in fetch_in_batches(cursor):
+                    store.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+
+            store.execute(
+                "INSERT OR REPLACE INTO store_metadata VALUES ('refreshed_at', ?)", [refreshed_at]
+            )
+
+        conn.unregister('c360_changed')
+        logger.info(f"Customer 360 store refreshed in {(datetime.now() - started_at).total_seconds():.2f}s")
+        return len(changed), len(removed)
+
+    except Exception as e:
+        logger.error(f"Error refreshing customer 360 store: {e}")
+        raise
+    finally:
+        store.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh the customer 360 serving store")
+    parser.add_argument('--full-refresh', action='store_true', help="Rewrite every customer")
+    args = parser.parse_args()
+
+    refresh_customer_store(full_refresh=args.full_refresh)
@@ -0,0 +1,582 @@
+"""
+Pipeline orchestrator for Tabby DWH project
+Runs bronze loads and dbt models as one dependency graph, starting each model
+as soon as the bronze tables it reads from have landed
+"""
+
+import os
+import re
+import json
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+import logging
+
+import pandas as pd
+import yaml
+
+from bronze_layer_etl import (
+    DUCKDB_PATH,
+    TABLES,
+    connect_duckdb,
+    ensure_data_directory,
+    ensure_bronze_schema,
+    extract_from_postgres,
+    extract_user_events,
+    load_to_bronze,
+)
+from bronze_data_quality import DQ_RULES
+from refresh_customer_store import refresh_customer_store
+from tabby_dbt import DBT_PROJECT_DIR, dbt_time_to_local
+
+
+#set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s- %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger('pipeline')
+
+
+MODELS_DIR = os.path.join(DBT_PROJECT_DIR, 'models')
+SEEDS_DIR = os.path.join(DBT_PROJECT_DIR, 'seeds')
+MACROS_DIR = os.path.join(DBT_PROJECT_DIR, 'macros')
+
+# Project files that change how every model is built
+PROJECT_CONFIG_FILES = ['dbt_project.yml', 'profiles.yml', 'packages.yml', 'package-lock.yml']
+
+# Fingerprints of the last successful build of every node, used to skip
+# unchanged work and to resume after a crash
+STATE_PATH = os.path.join(os.path.dirname(DUCKDB_PATH), 'pipeline_state.json')
+RUNS_DIR = os.path.join(os.path.dirname(DUCKDB_PATH), 'pipeline_runs')
+
+BRONZE_TABLES = TABLES + ['user_events']
+
+# Statuses that let downstream nodes proceed
+OK_STATUSES = ('success', 'skipped', 'quarantined')
+
+# Models the customer 360 serving store is exported from
+SERVING_INPUTS = [
+    'gold_customer_analytics',
+    'fact_payment_plans',
+    'fact_customer_events',
+    'stg_installments',
+]
+
+# Facts whose compression report_fact_compression (macros/column_storage.sql) records
+FACT_MODELS = ['fact_transactions', 'fact_payment_plans', 'fact_customer_events']
+
+# How often DuckDB memory and spill usage is sampled while the run is in progress
+MEMORY_SAMPLE_INTERVAL_SECONDS = 0.25
+
+# Models reading the current date change from one day to the next even when
+# their inputs do not
+DATE_DEPENDENT_PATTERN = re.compile(r"\bcurrent_date\b|\btoday\(", re.IGNORECASE)
+
+REF_PATTERN = re.compile(r"""ref\(\s*['"](\w+)['"]\s*\)""")
+SOURCE_PATTERN = re.compile(r"""source\(\s*['"](\w+)['"]\s*,\s*['"](\w+)['"]\s*\)""")
+
+
+def load_declared_sources():
+    """Return the set of (source, table) pairs declared in sources.yml"""
+    with open(os.path.join(MODELS_DIR, 'sources.yml')) as f:
+        config = yaml.safe_load(f)
+
+    return {
+        (source['name'], table['name'])
+        for source in config.get('sources', [])
+        for table in source.get('tables', [])
+    }
+
+
+def build_graph():
+    """
+    Build the node graph: one node per bronze table, dbt seed and dbt model.
+    Model edges come from ref() and source() calls in the model SQL.
+    """
+    graph = {}
+
+    for table in BRONZE_TABLES:
+        # Referential checks need the parents loaded first
+        parents = {parent for parent, _ in DQ_RULES.get(table, {}).get('foreign_keys', {}).values()}
+        graph[f"bronze.{table}"] = {
+            'type': 'bronze',
+            'name': table,
+            'upstream': {f"bronze.{parent}" for parent in parents},
+        }
+
+    for file_name in sorted(os.listdir(SEEDS_DIR)):
+        if file_name.endswith('.csv'):
+            graph[file_name[:-len('.csv')]] = {
+                'type': 'seed',
+                'name': file_name[:-len('.csv')],
+                'path': os.path.join(SEEDS_DIR, file_name),
+                'upstream': set(),
+            }
+
+    declared_sources = load_declared_sources()
+
+    for root, _, files in os.walk(MODELS_DIR):
+        for file_name in sorted(files):
+            if not file_name.endswith('.sql'):
+                continue
+            path = os.path.join(root, file_name)
+            with open(path) as f:
+                sql = f.read()
+
+            upstream = set()
+            for source_name, table in SOURCE_PATTERN.findall(sql):
+                if (source_name, table) not in declared_sources:
+                    raise ValueError(f"{file_name} reads undeclared source {source_name}.{table}")
+                upstream.add(f"{source_name}.{table}")
+            upstream.update(REF_PATTERN.findall(sql))
+
+            graph[file_name[:-len('.sql')]] = {
+                'type': 'model',
+                'name': file_name[:-len('.sql')],
+                'path': path,
+                'upstream': upstream,
+            }
+
+    for node_id, node in graph.items():
+        missing = node['upstream'] - graph.keys()
+        if missing:
+            raise ValueError(f"{node_id} depends on unknown nodes: {', '.join(sorted(missing))}")
+
+    return graph
+
+
+def load_state():
+    if os.path.exists(STATE_PATH):
+        with open(STATE_PATH) as f:
+            return json.load(f)
+    return {}
+
+
+def save_state(state):
+    tmp_path = f"{STATE_PATH}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, STATE_PATH)
+
+
+def fingerprint_dataframe(df):
+    """Content hash of an extracted batch, ignoring ETL metadata columns"""
+    data_columns = [col for col in df.columns if not col.startswith('_etl_')]
+    row_hashes = pd.util.hash_pandas_object(df[data_columns], index=False)
+    digest = hashlib.sha256(','.join(data_columns).encode())
+    digest.update(row_hashes.to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def fingerprint_project():
+    """Hash of the project configuration and macros shared by every dbt node"""
+    paths = [os.path.join(DBT_PROJECT_DIR, name) for name in PROJECT_CONFIG_FILES]
+    for root, _, files in os.walk(MACROS_DIR):
+        paths.extend(os.path.join(root, file_name) for file_name in files)
+
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        if os.path.exists(path):
+            digest.update(os.path.relpath(path, DBT_PROJECT_DIR).encode())
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
+
+def fingerprint_model(node, upstream_fingerprints, project_fingerprint, run_date):
+    """
+    A model or seed is unchanged when its file, the project configuration and
+    every input are unchanged. Models using the current date also change daily.
+    """
+    digest = hashlib.sha256()
+    with open(node['path'], 'rb') as f:
+        content = f.read()
+    digest.update(content)
+    digest.update(project_fingerprint.encode())
+    if node['type'] == 'model' and DATE_DEPENDENT_PATTERN.search(content.decode()):
+        digest.update(run_date.isoformat().encode())
+    for upstream_id in sorted(upstream_fingerprints):
+        digest.update(f"{upstream_id}={upstream_fingerprints[upstream_id]}".encode())
+    return digest.hexdigest()
+
+
+def relation_exists(name, schema=None):
+    conn = connect_duckdb()
+    try:
+        query = "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?"
+        params = [name]
+        if schema:
+            query += " AND table_schema = ?"
+            params.append(schema)
+        return conn.execute(query, params).fetchone()[0] > 0
+    finally:
+        conn.close()
+
+
+def run_bronze_node(node, run_id, previous_fingerprint):
+    """Extract a bronze table and load it unless its content is unchanged"""
+    started_at = datetime.now()
+    table = node['name']
+
+    if table == 'user_events':
+        df = extract_user_events()
+    else:
+        df = extract_from_postgres(table)
+
+    fingerprint = fingerprint_dataframe(df)
+    if fingerprint == previous_fingerprint and relation_exists(table, 'bronze'):
+        logger.info(f"bronze.{table} unchanged since last successful run, skipping load")
+        status = 'skipped'
+    elif load_to_bronze(df, table, run_id):
+        status = 'success'
+    elif relation_exists(table, 'bronze'):
+        # Bronze keeps the previous batch, so downstream sees the previous inputs
+        status = 'quarantined'
+        fingerprint = previous_fingerprint
+    else:
+        logger.error(f"bronze.{table} was quarantined and has no previous load to fall back on")
+        status = 'failed'
+        fingerprint = None
+
+    return [{
+        'node_id': f"bronze.{table}",
+        'status': status,
+        'fingerprint': fingerprint,
+        'started_at': started_at,
+        'finished_at': datetime.now(),
+    }]
+
+
+def sample_memory(stop_event, samples):
+    """
+    Poll DuckDB memory and temp-file usage until stopped. Bronze loads and dbt
+    run in this process, so they all share the database instance sampled here.
+    """
+    conn = connect_duckdb()
+    try:
+        while not stop_event.is_set():
+            memory_bytes, spill_bytes = conn.execute(
+                "SELECT sum(memory_usage_bytes), sum(temporary_storage_bytes) FROM duckdb_memory()"
+            ).fetchone()
+            samples.append((datetime.now(), memory_bytes or 0, spill_bytes or 0))
+            stop_event.wait(MEMORY_SAMPLE_INTERVAL_SECONDS)
+    except Exception as e:
+        logger.warning(f"Memory sampling stopped: {e}")
+    finally:
+        conn.close()
+
+
+def attach_peak_memory(results, samples):
+    """
+    Peak memory and spill observed while each node ran. DuckDB has no per-query
+    peak, so nodes that overlap in time report the same instance-wide peak.
+    """
+    for result in results.values():
+        window = [s for s in samples if result['started_at'] <= s[0] <= result['finished_at']]
+        result['peak_memory_bytes'] = max((s[1] for s in window), default=None)
+        result['peak_spill_bytes'] = max((s[2] for s in window), default=None)
+
+
+def _format_bytes(value):
+    return 'n/a' if value is None else f"{value / 2**20:,.0f} MB"
+
+
+def run_dbt_models(model_names, fingerprints, command='run'):
+    """Build a batch of ready models, or load a batch of seeds, in a single dbt invocation"""
+    # dbt is imported lazily, it is slow to import and only needed here
+    from dbt.cli.main import dbtRunner
+
+    started_at = datetime.now()
+    logger.info(f"Running dbt {command}: {', '.join(sorted(model_names))}")
+
+    res = dbtRunner().invoke([
+        command,
+        '--project-dir', DBT_PROJECT_DIR,
+        '--profiles-dir', DBT_PROJECT_DIR,
+        '--select', *sorted(model_names),
+    ])
+    finished_at = datetime.now()
+
+    node_results = {}
+    if res.result is not None:
+        for r in res.result.results:
+            # Project hooks (on-run-start/end) are reported as results too
+            if r.node.resource_type not in ('model', 'seed') or r.node.name not in fingerprints:
+                continue
+            node_started, node_finished = started_at, finished_at
+            for timing in r.timing:
+                if timing.name == 'execute' and timing.started_at and timing.completed_at:
+                    node_started, node_finished = dbt_time_to_local(timing.started_at), dbt_time_to_local(timing.completed_at)
+            status = 'success' if r.status == 'success' else 'failed'
+            if status == 'failed':
+                logger.error(f"dbt model {r.node.name} failed: {r.message}")
+            node_results[r.node.name] = {
+                'node_id': r.node.name,
+                'status': status,
+                'fingerprint': fingerprints[r.node.name],
+                'started_at': node_started,
+                'finished_at': node_finished,
+            }
+
+    if res.exception is not None:
+        logger.error(f"dbt invocation failed: {res.exception}")
+
+    # Anything dbt did not report on counts as failed
+    for name in model_names:
+        node_results.setdefault(name, {
+            'node_id': name,
+            'status': 'failed',
+            'fingerprint': fingerprints[name],
+            'started_at': started_at,
+            'finished_at': finished_at,
+        })
+
+    return list(node_results.values())
+
+
+def report_fact_compression():
+    """Checkpoint the warehouse and record the fact tables' column compression"""
+    from dbt.cli.main import dbtRunner
+
+    res = dbtRunner().invoke([
+        'run-operation', 'report_fact_compression',
+        '--project-dir', DBT_PROJECT_DIR,
+        '--profiles-dir', DBT_PROJECT_DIR,
+    ])
+    if not res.success:
+        logger.error(f"Failed to record fact compression: {res.exception}")
+
+
+def compute_critical_path(graph, results):
+    """Longest chain of node durations through the graph"""
+    longest = {}
+
+    def visit(node_id):
+        if node_id not in longest:
+            result = results.get(node_id)
+            duration = (result['finished_at'] - result['started_at']).total_seconds() if result else 0.0
+            best_parent = max(graph[node_id]['upstream'], key=lambda u: visit(u)[0], default=None)
+            parent_total = visit(best_parent)[0] if best_parent else 0.0
+            longest[node_id] = (parent_total + duration, best_parent)
+        return longest[node_id]
+
+    end_node = max(graph, key=lambda n: visit(n)[0])
+    total = visit(end_node)[0]
+
+    path = []
+    node_id = end_node
+    while node_id:
+        path.append(node_id)
+        node_id = longest[node_id][1]
+
+    return list(reversed(path)), total
+
+
+def write_run_summary(graph, results, run_id, started_at, finished_at):
+    """Log critical-path timing and persist the run summary"""
+    path, path_seconds = compute_critical_path(graph, results)
+    wall_seconds = (finished_at - started_at).total_seconds()
+
+    logger.info(f"Run {run_id} finished in {wall_seconds:.2f}s")
+    logger.info(f"Critical path ({path_seconds:.2f}s): {' -> '.join(path)}")
+    for node_id in path:
+        result = results.get(node_id)
+        if result:
+            duration = (result['finished_at'] - result['started_at']).total_seconds()
+            logger.info(f"  {node_id:<35} {result['status']:<15} {duration:8.2f}s")
+
+    by_memory = sorted(
+        (r for r in results.values() if r.get('peak_memory_bytes') is not None),
+        key=lambda r: r['peak_memory_bytes'], reverse=True
+    )
+    if by_memory:
+        logger.info("Peak memory by node (instance-wide while the node ran):")
+        for result in by_memory[:5]:
+            logger.info(f"  {result['node_id']:<35} {_format_bytes(result['peak_memory_bytes']):>12} "
+                        f"spilled {_format_bytes(result['peak_spill_bytes'])}")
+
+    os.makedirs(RUNS_DIR, exist_ok=True)
+    summary = {
+        'run_id': run_id,
+        'started_at': started_at.isoformat(),
+        'finished_at': finished_at.isoformat(),
+        'wall_seconds': wall_seconds,
+        'critical_path': path,
+        'critical_path_seconds': path_seconds,
+        'nodes': {
+            node_id: {
+                'status': result['status'],
+                'started_at': result['started_at'].isoformat(),
+                'finished_at': result['finished_at'].isoformat(),
+                'seconds': (result['finished_at'] - result['started_at']).total_seconds(),
+                'peak_memory_bytes': result.get('peak_memory_bytes'),
+                'peak_spill_bytes': result.get('peak_spill_bytes'),
+            }
+            for node_id, result in results.items()
+        },
+    }
+    summary_path = os.path.join(RUNS_DIR, f"run_{run_id}.json")
+    with open(summary_path, 'w') as f:
+        json.dump(summary, f, indent=2)
+    logger.info(f"Run summary written to {summary_path}")
+
+
+def run_pipeline(threads=4, full_refresh=False):
+    """
+    Run the whole pipeline. Bronze tables load in parallel (parents first),
+    and every dbt model starts once all of its inputs are built. Ready models
+    are batched into one dbt invocation at a time, because dbt cannot be
+    invoked concurrently from the same process.
+    """
+    run_id = datetime.now().strftime("%Y%m%d%H%M%S")
+    started_at = datetime.now()
+    logger.info(f"Starting pipeline run {run_id}")
+
+    ensure_data_directory()
+    ensure_bronze_schema()
+
+    graph = build_graph()
+    project_fingerprint = fingerprint_project()
+    run_date = started_at.date()
+    state = {} if full_refresh else load_state()
+    state_lock = threading.Lock()
+
+    results = {}
+    fingerprints = {}
+    pending = set(graph)
+    running = {}
+    dbt_running = False
+
+    memory_samples = []
+    stop_sampling = threading.Event()
+    sampler = threading.Thread(target=sample_memory, args=(stop_sampling, memory_samples), daemon=True)
+    sampler.start()
+
+    def finish(result):
+        node_id = result['node_id']
+        results[node_id] = result
+        fingerprints[node_id] = result.get('fingerprint')
+        with state_lock:
+            if result['status'] in OK_STATUSES and result.get('fingerprint'):
+                state[node_id] = {
+                    'fingerprint': result['fingerprint'],
+                    'finished_at': result['finished_at'].isoformat(),
+                }
+            elif result['status'] == 'failed':
+                # Never skip a node whose last attempt failed
+                state.pop(node_id, None)
+            save_state(state)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        while pending or running:
+            scheduled = False
+
+            for node_id in sorted(pending):
+                upstream_statuses = [results[u]['status'] for u in graph[node_id]['upstream'] if u in results]
+                if any(status not in OK_STATUSES for status in upstream_statuses):
+                    now = datetime.now()
+                    logger.warning(f"Skipping {node_id}: an upstream node failed")
+                    finish({'node_id': node_id, 'status': 'upstream_failed', 'started_at': now, 'finished_at': now})
+                    pending.discard(node_id)
+                    scheduled = True
+
+            ready = [n for n in sorted(pending) if all(u in results for u in graph[n]['upstream'])]
+
+            ready_models = {}
+            for node_id in ready:
+                node = graph[node_id]
+                if node['type'] == 'bronze':
+                    previous = state.get(node_id, {}).get('fingerprint')
+                    future = executor.submit(run_bronze_node, node, run_id, previous)
+                    running[future] = [node_id]
+                    pending.discard(node_id)
+                    scheduled = True
+                    continue
+
+                fingerprint = fingerprint_model(
+                    node, {u: fingerprints[u] for u in node['upstream']}, project_fingerprint, run_date
+                )
+                if state.get(node_id, {}).get('fingerprint') == fingerprint and relation_exists(node['name']):
+                    now = datetime.now()
+                    logger.info(f"{node_id} inputs unchanged since last successful run, skipping")
+                    finish({'node_id': node_id, 'status': 'skipped', 'fingerprint': fingerprint,
+                            'started_at': now, 'finished_at': now})
+                    pending.discard(node_id)
+                    scheduled = True
+                else:
+                    ready_models[node_id] = fingerprint
+
+            if ready_models and not dbt_running:
+                # Seeds need their own `dbt seed` invocation
+                seeds = {n: fp for n, fp in ready_models.items() if graph[n]['type'] == 'seed'}
+                batch, command = (seeds, 'seed') if seeds else (ready_models, 'run')
+                future = executor.submit(run_dbt_models, list(batch), batch, command)
+                running[future] = list(batch)
+                pending.difference_update(batch)
+                dbt_running = True
+                scheduled = True
+
+            # Finished or skipped nodes may have unblocked others, look again before waiting
+            if scheduled:
+                continue
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                node_ids = running.pop(future)
+                if graph[node_ids[0]]['type'] != 'bronze':
+                    dbt_running = False
+                try:
+                    node_results = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to process {', '.join(node_ids)}: {e}")
+                    now = datetime.now()
+                    node_results = [{'node_id': n, 'status': 'failed', 'started_at': now, 'finished_at': now}
+                                    for n in node_ids]
+                for result in node_results:
+                    finish(result)
+
+    # Compression is only final once checkpointed, so it is recorded after the builds
+    if any(results.get(n, {}).get('status') == 'success' for n in FACT_MODELS):
+        report_fact_compression()
+
+    # The refresh is incremental, so it runs after every build whose inputs are usable
+    if all(results.get(n, {}).get('status') in OK_STATUSES for n in SERVING_INPUTS):
+        try:
+            refresh_customer_store()
+        except Exception as e:
+            logger.error(f"Failed to refresh the customer 360 store: {e}")
+    else:
+        logger.warning("Customer 360 store not refreshed: one of its inputs failed")
+
+    stop_sampling.set()
+    sampler.join()
+    attach_peak_memory(results, memory_samples)
+
+    write_run_summary(graph, results, run_id, started_at, datetime.now())
+
+    failed = [n for n, r in results.items() if r['status'] not in OK_STATUSES]
+    quarantined = [n for n, r in results.items() if r['status'] == 'quarantined']
+    if failed:
+        logger.error(f"Pipeline run {run_id} finished with failures: {', '.join(sorted(failed))}")
+    if quarantined:
+        # Downstream was built on the previous loads, but the new data needs attention
+        logger.error(f"Pipeline run {run_id} quarantined batches: {', '.join(sorted(quarantined))}")
+    if not failed and not quarantined:
+        logger.info(f"Pipeline run {run_id} completed successfully")
+    return not failed and not quarantined
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run bronze loads and dbt models as one dependency graph")
+    parser.add_argument('--threads', type=int, default=4, help="Maximum number of nodes running at once")
+    parser.add_argument('--full-refresh', action='store_true', help="Ignore saved state and rebuild every node")
+    args = parser.parse_args()
+
+    raise SystemExit(0 if run_pipeline(threads=args.threads, full_refresh=args.full_refresh) else 1)
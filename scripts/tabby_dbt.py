@@ -0,0 +1,19 @@
+"""
+dbt project helpers for Tabby DWH project
+Locations and conventions shared by the scripts that invoke dbt in-process
+(run_pipeline.py, profile_dbt_models.py)
+"""
+
+import os
+from datetime import timezone
+
+
+# profiles.yml lives next to dbt_project.yml, so this is also the --profiles-dir
+DBT_PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dbt_project', 'tabby_dbt')
+
+
+def dbt_time_to_local(ts):
+    """dbt reports timings in UTC, the scripts log and record local time"""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.astimezone().replace(tzinfo=None)
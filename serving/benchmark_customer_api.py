@@ -0,0 +1,96 @@
+"""
+Latency and throughput benchmark for customer 360 lookups
+Measures direct store lookups, and the HTTP API when --url is given
+"""
+
+import time
+import random
+import argparse
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import urlopen
+from urllib.error import HTTPError
+
+from customer_api import CUSTOMER_STORE_PATH, connect_store, get_customer_360
+
+
+def sample_customer_ids(store_path, sample_size):
+    conn = connect_store(store_path)
+    try:
+        ids = [r[0] for r in conn.execute("SELECT customer_id FROM customers")]
+    finally:
+        conn.close()
+    if not ids:
+        raise SystemExit(f"No customers in {store_path}, run scripts/refresh_customer_store.py first")
+    return [random.choice(ids) for _ in range(sample_size)]
+
+
+def make_store_lookup(store_path):
+    local = threading.local()
+
+    def lookup(customer_id):
+        if getattr(local, 'conn', None) is None:
+            local.conn = connect_store(store_path)
+        return get_customer_360(local.conn, customer_id)
+
+    return lookup
+
+
+def make_http_lookup(base_url):
+    def lookup(customer_id):
+        try:
+            with urlopen(f"{base_url.rstrip('/')}/customers/{customer_id}") as response:
+                return response.read()
+        except HTTPError as e:
+            if e.code != 404:
+                raise
+
+    return lookup
+
+
+def run_benchmark(name, lookup, customer_ids, threads):
+    # Warm up caches and connections before timing
+    for customer_id in customer_ids[:min(100, len(customer_ids))]:
+        lookup(customer_id)
+
+    def timed(customer_id):
+        start = time.perf_counter()
+        lookup(customer_id)
+        return time.perf_counter() - start
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        latencies = list(executor.map(timed, customer_ids))
+    elapsed = time.perf_counter() - started
+
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    quantiles = statistics.quantiles(latencies_ms, n=100)
+
+    print(f"\n{name} ({len(customer_ids)} lookups, {threads} threads)")
+    print(f"  QPS:  {len(customer_ids) / elapsed:,.0f}")
+    print(f"  mean: {statistics.mean(latencies_ms):.3f} ms")
+    print(f"  p50:  {quantiles[49]:.3f} ms")
+    print(f"  p95:  {quantiles[94]:.3f} ms")
+    print(f"  p99:  {quantiles[98]:.3f} ms")
+    print(f"  max:  {latencies_ms[-1]:.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark customer 360 lookups")
+    parser.add_argument('--store', default=CUSTOMER_STORE_PATH, help="Path to the customer 360 SQLite store")
+    parser.add_argument('--lookups', type=int, default=10000)
+    parser.add_argument('--threads', type=int, default=1)
+    parser.add_argument('--url', help="Also benchmark the HTTP API at this base URL")
+    args = parser.parse_args()
+
+    random.seed(42)
+    customer_ids = sample_customer_ids(args.store, args.lookups)
+
+    run_benchmark("Store lookups", make_store_lookup(args.store), customer_ids, args.threads)
+    if args.url:
+        run_benchmark(f"HTTP lookups via {args.url}", make_http_lookup(args.url), customer_ids, args.threads)
+
+
+if __name__ == "__main__":
+    main()
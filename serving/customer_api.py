@@ -0,0 +1,205 @@
+"""
+Customer 360 lookup API for Tabby DWH project
+Serves one customer's profile, active plans, overdue installments and recent
+events from the SQLite store built by scripts/refresh_customer_store.py
+"""
+
+import os
+import re
+import json
+import queue
+import sqlite3
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import logging
+
+
+#set up logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s- %(levelname)s - %(message)s'
+)
+
+logger = logging.getLogger('customer-api')
+
+
+CUSTOMER_STORE_PATH = os.environ.get(
+    "CUSTOMER_STORE_PATH",
+    os.path.expanduser("~/tabby-dwh/data/customer_360.sqlite")
+)
+
+CUSTOMER_PATH = re.compile(r"^/customers/([A-Za-z0-9_-]+)$")
+
+# ThreadingHTTPServer starts a new thread per request, so connections are
+# pooled across requests rather than kept per thread
+CUSTOMER_STORE_POOL_SIZE = int(os.environ.get("CUSTOMER_STORE_POOL_SIZE", 8))
+
+
+def connect_store(path=CUSTOMER_STORE_PATH, check_same_thread=True):
+    """Open a read-only connection tuned for point lookups"""
+    conn = sqlite3.connect(path, check_same_thread=check_same_thread)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA query_only = 1")
+    conn.execute("PRAGMA mmap_size = 268435456")
+    return conn
+
+
+class ConnectionPool:
+    """
+    At most `size` read-only store connections, shared by the request threads.
+    A connection is used by one request at a time; requests beyond `size`
+    wait for one to be returned. The store is in WAL mode, so pooled
+    connections keep reading while a refresh is written.
+    """
+
+    def __init__(self, path=CUSTOMER_STORE_PATH, size=CUSTOMER_STORE_POOL_SIZE):
+        self.path = path
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle = queue.LifoQueue()
+
+    @contextmanager
+    def connection(self):
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = connect_store(self.path, check_same_thread=False)
+            try:
+                yield conn
+            finally:
+                self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def _days_between(start, end):
+    if not start:
+        return None
+    return (end - datetime.fromisoformat(start).date()).days
+
+
+def get_customer_360(conn, customer_id):
+    """
+    Look up one customer. Every query is a primary key range scan on
+    customer_id. Returns None when the customer is unknown.
+    """
+    row = conn.execute(
+        "SELECT profile, refreshed_at FROM customers WHERE customer_id = ?", [customer_id]
+    ).fetchone()
+    if row is None:
+        return None
+
+    today = date.today()
+    profile = json.loads(row['profile'])
+    # Kept out of the store so unchanged customers are not rewritten every day
+    profile['days_since_registration'] = _days_between(profile.get('registration_date'), today)
+    profile['days_since_last_transaction'] = _days_between(
+        profile.get('last_transaction_date') or profile.get('registration_date'), today
+    )
+
+    active_plans = [dict(r) for r in conn.execute(
+        "SELECT * FROM active_plans WHERE customer_id = ? ORDER BY plan_date DESC", [customer_id]
+    )]
+
+    overdue_installments = []
+    for r in conn.execute(
+        "SELECT * FROM overdue_installments WHERE customer_id = ? ORDER BY due_date", [customer_id]
+    ):
+        installment = dict(r)
+        installment['days_overdue'] = _days_between(installment['due_date'], today)
+        overdue_installments.append(installment)
+
+    recent_events = [dict(r) for r in conn.execute(
+        "SELECT * FROM recent_events WHERE customer_id = ? ORDER BY event_timestamp DESC", [customer_id]
+    )]
+
+    for child in active_plans + overdue_installments + recent_events:
+        child.pop('customer_id')
+
+    return {
+        'customer_id': customer_id,
+        'profile': profile,
+        'active_plans': active_plans,
+        'overdue_installments': overdue_installments,
+        'overdue_amount_usd': round(sum(i['amount_usd'] or 0 for i in overdue_installments), 2),
+        'recent_events': recent_events,
+        'refreshed_at': row['refreshed_at'],
+    }
+
+
+class CustomerApiHandler(BaseHTTPRequestHandler):
+    """GET /customers/<customer_id> and GET /health"""
+
+    pool = None
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            with self.pool.connection() as conn:
+                row = conn.execute(
+                    "SELECT value FROM store_metadata WHERE key = 'refreshed_at'"
+                ).fetchone()
+            self._send_json(200, {'status': 'ok', 'refreshed_at': row['value'] if row else None})
+            return
+
+        match = CUSTOMER_PATH.match(self.path)
+        if not match:
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        try:
+            with self.pool.connection() as conn:
+                customer = get_customer_360(conn, match.group(1))
+        except Exception as e:
+            logger.error(f"Error looking up {match.group(1)}: {e}")
+            self._send_json(500, {'error': 'lookup failed'})
+            return
+
+        if customer is None:
+            self._send_json(404, {'error': f"customer {match.group(1)} not found"})
+        else:
+            self._send_json(200, customer)
+
+    def log_message(self, format, *args):
+        # Per-request access logs would dominate the lookup cost
+        logger.debug(format % args)
+
+
+def serve(host="127.0.0.1", port=8080, store_path=CUSTOMER_STORE_PATH, pool_size=CUSTOMER_STORE_POOL_SIZE):
+    CustomerApiHandler.pool = ConnectionPool(store_path, pool_size)
+    server = ThreadingHTTPServer((host, port), CustomerApiHandler)
+    logger.info(f"Serving customer 360 lookups from {store_path} on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        CustomerApiHandler.pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Customer 360 lookup API")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--store', default=CUSTOMER_STORE_PATH, help="Path to the customer 360 SQLite store")
+    parser.add_argument('--pool-size', type=int, default=CUSTOMER_STORE_POOL_SIZE,
+                        help="Store connections shared by the request threads")
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.store, args.pool_size)